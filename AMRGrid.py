@@ -0,0 +1,266 @@
+#################################################################
+# Name:     AMRGrid.py                                          #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program refines a particle mesh with nested patches #
+#           where grid cells hold much mass, each patch solving #
+#           its own Poisson equation with boundary potentials   #
+#           from the mesh above it.                             #
+#################################################################
+
+#essential modules
+import numpy as np
+
+#essential imports
+from PMGrid import Grid, assignment
+from gradient import Grad
+import Profiler
+
+#################################################################
+# The base mesh is solved periodically as PMGrid.Grid solves    #
+#  -lap psi = rho/M                                             #
+# with M its number of points along x. A patch covers a box of  #
+# cells of the mesh above it, ratio times finer, and solves the #
+# same equation with the same M on its interior points, psi on  #
+# its edge points fixed by linear interpolation of the mesh     #
+# above, by discrete sine transforms. The periodic solve drops  #
+# the mean density of the base mesh, so patches subtract it     #
+# too, else the potentials disagree. Bodies take forces from    #
+# the finest patch holding them at least buffer cells of the    #
+# mesh above from its edges.                                    #
+#################################################################
+
+#function: type I discrete sine transform along axis, numpy only
+def _dst(a, axis):
+    #S_k = sum_j a_j sin(pi j k/(n+1)), j, k = 1..n, from the FFT
+    #of the odd extension [0, a, 0, -reversed a]
+    a = np.moveaxis(a, axis, -1)
+    n = a.shape[-1]
+    ext = np.zeros(a.shape[:-1] + (2*n + 2,))
+    ext[...,1:n+1] = a
+    ext[...,n+2:] = -a[...,::-1]
+    S = -0.5*np.fft.rfft(ext)[...,1:n+1].imag
+    return np.moveaxis(S, -1, axis)
+
+#function: solve -lap psi = f inside a rectangle with psi given on its edges
+def dirichletSolve(f, edge, h):
+    #################################################
+    # f : (nx,ny) right hand side at every point,   #
+    #     edge rows and columns ignored             #
+    # edge : (nx,ny) array holding psi on its edges #
+    # h : point spacing                             #
+    #################################################
+    nx, ny = f.shape
+    rhs = f[1:-1,1:-1].copy()
+    #known edge values move to the right hand side of the 5 point stencil
+    rhs[0,:] += edge[0,1:-1]/h**2
+    rhs[-1,:] += edge[-1,1:-1]/h**2
+    rhs[:,0] += edge[1:-1,0]/h**2
+    rhs[:,-1] += edge[1:-1,-1]/h**2
+    #sine modes diagonalise the discrete Laplacian with zero edges
+    p = np.arange(1, nx-1)[:,None]
+    q = np.arange(1, ny-1)[None,:]
+    lam = (4 - 2*np.cos(np.pi*p/(nx-1)) - 2*np.cos(np.pi*q/(ny-1)))/h**2
+    coef = _dst(_dst(rhs, 0), 1)/lam
+    psi = edge.astype(float).copy()
+    psi[1:-1,1:-1] = _dst(_dst(coef, 0), 1)*(4.0/((nx-1)*(ny-1)))
+    return psi
+
+#function: boxes of cells covering flagged cells, Berger-Rigoutsos
+def clusters(flags, efficiency=0.7, minSize=4):
+    #################################################
+    # flags : (nx,ny) boolean cells to be covered   #
+    # efficiency : least flagged fraction of a box  #
+    # returns list of boxes (i0, j0, i1, j1), ends  #
+    # exclusive, in cells of flags                  #
+    #################################################
+    ii, jj = np.nonzero(flags)
+    if len(ii) == 0:
+        return []
+    i0, i1, j0, j1 = int(ii.min()), int(ii.max()) + 1, int(jj.min()), int(jj.max()) + 1
+    sub = flags[i0:i1, j0:j1]
+    if sub.mean() >= efficiency or max(sub.shape) <= minSize:
+        return [(i0, j0, i1, j1)]
+    #split at an empty row or column nearest the middle, else the middle
+    #of the longer side
+    axis = 0 if sub.shape[0] >= sub.shape[1] else 1
+    cut = None
+    for ax in (axis, 1 - axis):
+        holes = np.nonzero(sub.sum(axis=1 - ax) == 0)[0]
+        if len(holes):
+            axis, cut = ax, holes[np.argmin(np.abs(holes - sub.shape[ax]//2))]
+            break
+    if cut is None:
+        cut = sub.shape[axis]//2
+    halves = [(sub[:cut], i0, j0), (sub[cut:], i0 + cut, j0)] if axis == 0 else \
+             [(sub[:,:cut], i0, j0), (sub[:,cut:], i0, j0 + cut)]
+    boxes = []
+    for half, di, dj in halves:
+        boxes += [(di + b0, dj + b1, di + b2, dj + b3)
+                  for b0, b1, b2, b3 in clusters(half, efficiency, minSize)]
+    return boxes
+
+#function: pad boxes by buffer cells within shape, merging overlaps
+def padBoxes(boxes, buffer, shape):
+    if not boxes:
+        return []
+    b = np.array(boxes) + [-buffer, -buffer, buffer, buffer]
+    b = np.clip(b, 0, [shape[0], shape[1], shape[0], shape[1]])
+    while True:
+        #overlapping pairs, then each box grown to the bounding box of
+        #every box it overlaps, until no two boxes overlap
+        over = ((b[:,None,0] < b[None,:,2]) & (b[None,:,0] < b[:,None,2])
+                & (b[:,None,1] < b[None,:,3]) & (b[None,:,1] < b[:,None,3]))
+        if over.sum() == len(b):
+            break
+        lo = np.where(over[...,None], b[None,:,:2], np.iinfo(b.dtype).max).min(axis=1)
+        hi = np.where(over[...,None], b[None,:,2:], -1).max(axis=1)
+        b = np.unique(np.hstack([lo, hi]), axis=0)
+    return [tuple(int(x) for x in box) for box in b]
+
+#class: refined patch of a mesh
+class Patch(Grid):
+    """box of cells of a parent mesh, ratio times finer"""
+    def __init__(self, parent, box, ratio, M, background):
+        #################################################
+        # parent : Grid or Patch holding this patch     #
+        # box : (i0, j0, i1, j1) cells of parent        #
+        # M : points along x of the base mesh, which    #
+        #     sets the scale of the potential           #
+        # background : mean density of the base mesh    #
+        #################################################
+        i0, j0, i1, j1 = box
+        shape = ((i1 - i0)*ratio + 1, (j1 - j0)*ratio + 1)
+        Grid.__init__(self, np.zeros(shape), parent.r[0] + i0*parent.D,
+                      parent.r[1] + j0*parent.D, parent.D/ratio,
+                      kernel=parent.kernel, gradient='onesided', order=parent.order)
+        self.parent = parent
+        self.box = box
+        self.ratio = ratio
+        self.M = M
+        self.background = background
+        self.level = getattr(parent, 'level', 0) + 1
+
+    def contains(self, positions, margin):
+        #bodies at least margin from every edge of patch
+        x = (np.asarray(positions, dtype=float) - self.r)/self.D
+        hi = np.array(self.array.shape) - 1 - margin
+        return np.all((x >= margin) & (x <= hi), axis=1)
+
+    @Profiler.timed('pm.deposit')
+    def deposit(self, positions, masses, kernel=None):
+        #as Grid.deposit, but stencil weights off the patch are dropped
+        #rather than wrapped, so bodies just outside add what falls inside
+        kernel = self.kernel if kernel is None else kernel
+        x = (np.asarray(positions, dtype=float) - self.r)/self.D
+        i, offsets, w = assignment(x, kernel)
+        m = np.asarray(masses, dtype=float)
+        nx, ny = self.array.shape
+        mass = np.zeros(self.array.size)
+        for a, wa in zip(offsets, w):
+            for b, wb in zip(offsets, w):
+                ix, iy = i[:,0] + a, i[:,1] + b
+                on = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+                mass += np.bincount(ix[on]*ny + iy[on], (wa[:,0]*wb[:,1]*m)[on],
+                                    minlength=mass.size)
+        self.array = self.array + mass.reshape(self.array.shape)
+
+    def edge(self):
+        #potential of parent interpolated to the edge points of patch
+        i0, j0, i1, j1 = self.box
+        coarse = self.parent.potential[i0:i1+1, j0:j1+1]
+        edge = np.zeros(self.array.shape)
+        fine_i = np.arange(self.array.shape[0])/self.ratio
+        fine_j = np.arange(self.array.shape[1])/self.ratio
+        ci, cj = np.arange(coarse.shape[0]), np.arange(coarse.shape[1])
+        edge[0,:] = np.interp(fine_j, cj, coarse[0,:])
+        edge[-1,:] = np.interp(fine_j, cj, coarse[-1,:])
+        edge[:,0] = np.interp(fine_i, ci, coarse[:,0])
+        edge[:,-1] = np.interp(fine_i, ci, coarse[:,-1])
+        return edge
+
+    @Profiler.timed('amr.solve')
+    def evalForce(self):
+        #potential with parent's edge values, forces as gradient
+        density = self.array/self.D**2 - self.background
+        self.potential = dirichletSolve(density/self.M, self.edge(), self.D)
+        force_x, force_y = Grad(self.potential, self.D, self.order, 'onesided')
+        self.forces = np.stack([force_x, force_y], axis=-1)
+
+#class: particle mesh with nested refinement patches
+class AMRGrid(Grid):
+    """PMGrid.Grid refined where its cells hold much mass"""
+    def __init__(self, array, rx, ry, D, kernel='cic', gradient='onesided', order=2,
+                 levels=2, threshold=None, ratio=2, buffer=2, efficiency=0.7):
+        #################################################
+        # levels : most nested refinements, 0 for none  #
+        # threshold : point mass above which cells are  #
+        #   refined, default 2 mean body masses         #
+        # ratio : refinement of spacing per level       #
+        # buffer : cells of mesh above kept around      #
+        #   flagged cells, and between patch edges and  #
+        #   the bodies taking forces from the patch     #
+        # efficiency : least flagged fraction of patch  #
+        #################################################
+        Grid.__init__(self, array, rx, ry, D, kernel=kernel,
+                      gradient=gradient, order=order)
+        self.levels = levels
+        self.threshold = threshold
+        self.ratio = ratio
+        self.buffer = buffer
+        self.efficiency = efficiency
+        self.patches = []
+        self._bodies = []
+
+    def resetGrid(self):
+        Grid.resetGrid(self)
+        self._bodies = []
+
+    def deposit(self, positions, masses, kernel=None):
+        #base mesh as Grid, bodies kept for depositing on patches
+        Grid.deposit(self, positions, masses, kernel)
+        self._bodies.append((np.asarray(positions, dtype=float),
+                             np.asarray(masses, dtype=float)))
+
+    def evalForce(self):
+        #base mesh, then patches level by level from coarse to fine
+        Grid.evalForce(self)
+        self.patches = []
+        if not self._bodies:
+            return
+        r = np.concatenate([b[0] for b in self._bodies])
+        m = np.concatenate([b[1] for b in self._bodies])
+        threshold = self.threshold if self.threshold else 2*m.mean()
+        M = self.array.shape[0]
+        background = self.array.mean()/self.D**2
+        with Profiler.phase('amr.refine'):
+            parents = [self]
+            for level in range(self.levels):
+                children = []
+                for parent in parents:
+                    #cells flagged by mass on any of their four corner points
+                    heavy = parent.array > threshold
+                    flags = heavy[:-1,:-1] | heavy[1:,:-1] | heavy[:-1,1:] | heavy[1:,1:]
+                    for box in padBoxes(clusters(flags, self.efficiency),
+                                        self.buffer, flags.shape):
+                        patch = Patch(parent, box, self.ratio, M, background)
+                        #every body whose stencil reaches the patch, at most
+                        #the two points of a TSC half width outside it
+                        inside = patch.contains(r, -2)
+                        patch.deposit(r[inside], m[inside])
+                        patch.evalForce()
+                        children.append(patch)
+                self.patches += children
+                parents = children
+        Profiler.count('amr.patch', len(self.patches))
+
+    def interpolate(self, positions, kernel=None):
+        #base mesh forces, replaced by those of finer patches holding bodies
+        positions = np.asarray(positions, dtype=float)
+        forces = Grid.interpolate(self, positions, kernel)
+        for patch in self.patches:
+            inside = patch.contains(positions, self.buffer*self.ratio)
+            if inside.any():
+                forces[inside] = patch.interpolate(positions[inside], kernel)
+        return forces
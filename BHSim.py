@@ -8,18 +8,25 @@
 #################################################################
 
 #essential modules
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 #essential imports
-from Body import Body
 from Quad import Quad
-from BHTree import BHTree
-from MCgalaxy import generateGalaxy
+from LinearTree import LinearTree
+from Backends import getBackend
+from Parallel import ParallelForce
+from Integrator import BlockStep
+from MCgalaxy import galaxyParticles
+from Snapshot import SnapshotWriter, movie
+import Checkpoint
 
 #function: main
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Barnes-Hut galaxy simulation")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue from the last checkpoint")
+    args = parser.parse_args()
     #Milky Way parameters (default)
     r0 = 3 #kpc, scale length of galaxy
     m0 = 50.0 #10^9 solar mass, mass of galaxy
@@ -29,49 +36,68 @@ if __name__ == '__main__':
     #Barnes-Hut simulation resolution
     theta = 1.0
     epsilon = theta*L/np.sqrt(N)
-    #time evolution parameters
+    #worker processes evaluating forces, 1 runs in this process
+    workers = 1
+    #time evolution parameters, bodies take dt/2^level steps
     dt = 0.1 #10Myr
+    maxLevel = 6
     T = 10.0 #10Myr
     steps = int(T/dt)
-    #generate 1000 masses in 15kpc box
-    bodies = generateGalaxy(r0, m0, N, L)
-    #generate Barnes-Hut tree on original grid
-    tree = BHTree(Quad(-L,-L,2*L))
-    #populate tree with bodies from list
-    for body in bodies:
-        tree.insertBody(body)
-    #calculate force on every body from tree and evolve leapfrog step
-    for body in bodies:
-        body.resetForce()
-        tree.applyForce(body, theta, epsilon)
-        #take a half time step
-        body.leapFrog(dt)
+    #steps between checkpoints
+    checkpointEvery = 10
+    checkpoint = 'BH-Nbody'+str(N)+'.npz'
+    #Barnes-Hut tree on original grid, refit between full rebuilds
+    tree = LinearTree(Quad(-L,-L,2*L), leafSize=8, expansionOrder=2,
+                      rebuildInterval=4)
+    pool = ParallelForce(workers) if workers > 1 else None
+    #force kernels, 'numpy' or 'numba', also set by NBODY_BACKEND
+    backend = getBackend()
+    walk = pool.treeAccel if pool else backend.treeAccel
+    def computeForce(particles, active=None):
+        #update tree to moved bodies and calculate force on active bodies
+        tree.update(particles.r, particles.m)
+        if active is None:
+            particles.f[:] = particles.m[:,None]*walk(tree, theta, epsilon)
+        else:
+            particles.f[active] = (particles.m[active,None]
+                                   *walk(tree, theta, epsilon, sinks=active))
+    #individual power of two time steps, forces only on active bodies
+    step = BlockStep(epsilon, maxLevel=maxLevel)
 
-    #make list of objects for plotting
-    images = []
-    #plotting setup
-    fig = plt.figure()
-    ax = plt.axes(xlim=(-L, L), ylim=(-L, L))
+    #stream every frame to disk instead of keeping them for plotting
+    path = 'BH-Nbody'+str(N)+'.nbs'
+    if args.resume:
+        #bodies, forces, tree and time step levels as checkpointed
+        particles, start, t, states = Checkpoint.load(checkpoint)
+        tree.restore(states.get('tree', {}))
+        step.restore(states['integrator'])
+        snaps = SnapshotWriter(path, append=True, lastStep=start)
+    else:
+        #generate 1000 masses in 15kpc box
+        particles = galaxyParticles(r0, m0, N, L)
+        computeForce(particles)
+        start = 0
+        snaps = SnapshotWriter(path, every=1, meta={'N': len(particles), 'L': L,
+                                                    'dt': dt, 'solver': 'tree'})
+        snaps.write(particles, 0, 0.0)
     #evolve N-body in time
-    for i in range(steps):
+    for i in range(start, steps):
         #computation counter
-        print "Computing time step "+str(i+1)+"/"+str(steps)
-        #generate Barnes-Hut tree on original grid
-        tree = BHTree(Quad(-L,-L,2*L))
-        #populate tree with bodies from list
-        for body in bodies:
-            tree.insertBody(body)
-        #calculate force on every body from tree and evolve
-        for body in bodies:
-            body.resetForce()
-            tree.applyForce(body, theta, epsilon)
-            #take a time step
-            body.update(dt)
-        #append to list of objects for plotting
-        position = np.array([body.r for body in bodies]).T
-        scatter, = ax.plot(position[0], position[1], 'k.')
-        images.append((scatter,))
-                
-    anim = animation.ArtistAnimation(fig, images, interval=100, blit=True)
-    anim.save('BH-Nbody'+str(N)+'.mp4')
-    plt.show()
+        print("Computing time step "+str(i+1)+"/"+str(steps))
+        #evolve every body by kick-drift-kick leapfrog block steps
+        step(particles, dt, computeForce)
+        #append frame to snapshot file
+        snaps.write(particles, i+1, (i+1)*dt)
+        if (i+1) % checkpointEvery == 0:
+            Checkpoint.save(checkpoint, particles, i+1, (i+1)*dt,
+                            tree=tree.state(), integrator=step.state())
+    snaps.close()
+    if pool:
+        pool.close()
+    #against global steps at the finest level any body needed
+    print("Force evaluations "+str(step.forceEvaluations)+", global steps "
+          +"at the finest level used take "
+          +str(len(particles)*steps*2**step.finestLevel))
+
+    #render movie from snapshot file
+    movie(path, 'BH-Nbody'+str(N)+'.mp4', L, interval=100)
@@ -9,7 +9,6 @@
 
 #essential modules
 import numpy as np
-import matplotlib.pyplot as plt
 
 #essential imports
 from Body import Body
@@ -12,16 +12,21 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from time import clock
+from time import perf_counter as clock
 
 #essential imports
 from Body import Body
 from Quad import Quad
 from BHTree import BHTree
 from MCgalaxy import generateGalaxy
+from Particles import ParticleSet
+from LinearTree import LinearTree
+from Diagnostics import Diagnostics, treeEnergy
 
 #function: main
 if __name__ == '__main__':
+    #same galaxies on every run, so timings compare between runs
+    np.random.seed(0)
     #Milky Way parameters
     r0 = 3 #kpc, scale length of galaxy
     m0 = 50.0 #10^9 solar mass, mass of galaxy
@@ -61,20 +66,22 @@ if __name__ == '__main__':
     # Energy Conservation Test #
     ############################
     
-    #test energy conservation over evolution
-    t = np.linspace(0,steps*dt,steps)
-    E = np.zeros(len(t))
-    #sum kinetic
-    for body in bodies:
-        E[0]+=body.Kenergy(dt)
-    #sum potential
-    for j in range(len(bodies)):
-        for k in range(j+1,len(bodies)):
-            E[0]+=bodies[j].Uinteract(bodies[k])
+    #test energy conservation over evolution, potential from a
+    #linear tree rather than a sum over all pairs
+    potTree = LinearTree(Quad(-L,-L,2*L), leafSize=8, expansionOrder=2)
+    def potential(particles):
+        potTree.build(particles.r, particles.m)
+        return treeEnergy(potTree, particles.m, theta, epsilon)
+    diag = Diagnostics(potential, every=1)
+    def snapshot():
+        #velocities at position time, half a kick from leapfrog ones
+        return ParticleSet([body.m for body in bodies], [body.r for body in bodies],
+                           [body.vHalfStep(dt) for body in bodies])
+    diag(snapshot(), 0, 0.0)
     #evolve N-body in time
     for i in range(steps):
         #computation counter
-        print "Computing time step "+str(i+1)+"/"+str(steps)
+        print("Computing time step "+str(i+1)+"/"+str(steps))
         #generate Barnes-Hut tree on original grid
         tree = BHTree(Quad(-L,-L,2*L))
         #populate tree with bodies from list
@@ -86,13 +93,9 @@ if __name__ == '__main__':
             tree.applyForce(body, theta, epsilon)
             #take a time step
             body.update(dt)
-        #calculate energy at time
-        for body in bodies:
-            E[i]+=body.Kenergy(dt)
-        for j in range(len(bodies)):
-            for k in range(j+1,len(bodies)):
-                E[i]+=bodies[j].Uinteract(bodies[k])
-    plt.plot(t, E)
+        #record energy at time
+        diag(snapshot(), i+1, (i+1)*dt)
+    plt.plot(diag.column('t'), diag.column('E'))
     plt.title("Energy conservation")
     plt.ylabel("Energy [kMs*kpc^2/(10Myr)^2]")
     plt.show()
@@ -102,12 +105,12 @@ if __name__ == '__main__':
     #################################
 
     #test BH tree construction/traversal speed
-    nums = range(1,101)+range(101,1001,10)+range(1001,10000,100)
+    nums = np.array(list(range(1,101))+list(range(101,1001,10))+list(range(1001,10000,100)))
     timesTree = []
     timesForce = []
     for i in range(len(nums)):
         num = nums[i]
-        print "Computing number "+str(num)+"/10000"
+        print("Computing number "+str(num)+"/10000")
         bodies = generateGalaxy(r0, m0, num, L)
         #tree construction
         t_start = clock()
@@ -0,0 +1,79 @@
+#################################################################
+# Name:     Backends.py                                         #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program keeps a registry of interchangeable sets of #
+#           force kernels (pure NumPy, Numba compiled) selected #
+#           by name for N-body simulation.                      #
+#################################################################
+
+#essential modules
+import os
+import warnings
+from types import SimpleNamespace
+
+#################################################################
+# A backend is a set of kernels with the signatures:            #
+#  pairAccel(r, m, epsilon, tile=1024, sinks=None) -> (N,2)     #
+#  treeAccel(tree, theta, epsilon, sinks=None) -> (N,2)         #
+#  deposit(grid, positions, masses, kernel=None)                #
+#  gradient(image, h, order=2, boundary='onesided') -> ddx, ddy #
+#################################################################
+kernelNames = ('pairAccel', 'treeAccel', 'deposit', 'gradient')
+
+#function: pure NumPy kernels, always available
+def _loadNumpy():
+    from DirectSum import directAccel
+    from TreeWalk import treeAccel
+    from gradient import Grad
+    def deposit(grid, positions, masses, kernel=None):
+        grid.deposit(positions, masses, kernel)
+    return dict(pairAccel=directAccel, treeAccel=treeAccel,
+                deposit=deposit, gradient=Grad)
+
+#function: Numba compiled kernels, needs numba installed
+def _loadNumba():
+    import NumbaKernels
+    return dict(pairAccel=NumbaKernels.pairAccel,
+                treeAccel=NumbaKernels.treeAccel,
+                deposit=NumbaKernels.deposit,
+                gradient=NumbaKernels.gradient)
+
+#backend loaders by name, and kernel sets loaded so far
+_loaders = {'numpy': _loadNumpy, 'numba': _loadNumba}
+_backends = {}
+#backend used when none is named, overridden by NBODY_BACKEND
+_default = os.environ.get('NBODY_BACKEND', 'numpy')
+
+#function: register a loader returning a dict of kernels by name
+def register(name, loader):
+    _loaders[name] = loader
+    _backends.pop(name, None)
+
+#function: names of registered backends
+def names():
+    return sorted(_loaders)
+
+#function: kernel set of backend, missing kernels fall back to NumPy
+def getBackend(name=None):
+    name = _default if name is None else name
+    if name not in _backends:
+        if name not in _loaders:
+            raise ValueError("unknown backend '"+str(name)+"', choose from "
+                             +", ".join(names()))
+        kernels = _loadNumpy()
+        if name != 'numpy':
+            try:
+                kernels.update(_loaders[name]())
+            except ImportError as error:
+                warnings.warn("backend '"+name+"' unavailable ("+str(error)
+                              +"), using numpy kernels")
+        _backends[name] = SimpleNamespace(name=name, **kernels)
+    return _backends[name]
+
+#function: set backend used when none is named
+def setBackend(name):
+    global _default
+    getBackend(name)
+    _default = name
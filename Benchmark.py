@@ -0,0 +1,253 @@
+#################################################################
+# Name:     Benchmark.py                                        #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program times the solvers of the N-body code over a #
+#           range of N on seeded galaxies, writes the results   #
+#           as JSON and compares them against a stored baseline.#
+#                                                               #
+#   python Benchmark.py --out new.json --baseline old.json      #
+#                                                               #
+# Times only compare on the host, numpy and backend they were   #
+# taken with, so benchmarks/baseline.json is a reference of one #
+# machine, regenerated on each host that checks regressions:    #
+#   python Benchmark.py --out benchmarks/baseline.json          #
+#################################################################
+
+#essential modules
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+
+#essential imports
+from Quad import Quad
+from MCgalaxy import galaxyParticles
+from LinearTree import LinearTree
+from TreeWalk import treeAccel
+from DirectSum import directAccel
+from FMM import fmmAccel
+from PMGrid import Grid, greens
+from Integrator import leapFrog
+from Backends import getBackend
+
+#galaxy of every benchmark, as in BHSim and PMSim
+r0, m0, L = 3.0, 50.0, 15.0
+theta = 0.7
+
+#################################################################
+# Every benchmark is a setup function of N, run untimed, which  #
+# returns the function to time. Each has a largest N, beyond    #
+# which it takes too long to be worth repeating.                #
+#################################################################
+benchmarks = {}
+
+#function: register setup function as benchmark
+def benchmark(name, maxN=10**6):
+    def register(setup):
+        benchmarks[name] = (setup, maxN)
+        return setup
+    return register
+
+#function: seeded galaxy of N bodies, same bodies on every run
+def galaxy(N, seed):
+    np.random.seed(seed + N)
+    return galaxyParticles(r0, m0, N, L)
+
+#function: mesh as PMSim, spacing shrinking with more bodies
+def mesh(N):
+    D = L/np.sqrt(N)
+    M = int(np.ceil(2*L/D)) + 2
+    return Grid(np.zeros((M, M)), -L, -L, D, kernel='cic')
+
+@benchmark('tree.build')
+def _treeBuild(p):
+    tree = LinearTree(Quad(-L,-L,2*L), leafSize=8, expansionOrder=2)
+    return lambda: tree.build(p.r, p.m)
+
+@benchmark('tree.walk')
+def _treeWalk(p):
+    tree = LinearTree(Quad(-L,-L,2*L), leafSize=8, expansionOrder=2).build(p.r, p.m)
+    epsilon = L/np.sqrt(len(p))
+    walk = getBackend().treeAccel
+    return lambda: walk(tree, theta, epsilon)
+
+@benchmark('direct', maxN=10**4)
+def _direct(p):
+    epsilon = L/np.sqrt(len(p))
+    return lambda: directAccel(p.r, p.m, epsilon)
+
+@benchmark('fmm')
+def _fmm(p):
+    epsilon = L/np.sqrt(len(p))
+    return lambda: fmmAccel(p.r, p.m, epsilon)
+
+@benchmark('pm.deposit')
+def _pmDeposit(p):
+    grid = mesh(len(p))
+    def run():
+        grid.resetGrid()
+        grid.deposit(p.r, p.m)
+    return run
+
+@benchmark('pm.fft')
+def _pmFFT(p):
+    #transforms and Green's function of Grid.evalForce, without gradient
+    grid = mesh(len(p))
+    grid.deposit(p.r, p.m)
+    shape = grid.array.shape
+    def run():
+        density_fft = (1.0/shape[0])*np.fft.rfft2(grid.array/grid.D**2)
+        return np.fft.irfft2(density_fft*greens(shape, grid.D), s=shape)
+    return run
+
+@benchmark('pm.gradient')
+def _pmGradient(p):
+    #gradient of the solved potential, through the backend as evalForce
+    grid = mesh(len(p))
+    grid.deposit(p.r, p.m)
+    grid.evalForce()
+    grad = getBackend().gradient
+    return lambda: grad(grid.potential, grid.D, grid.order, grid.gradient)
+
+@benchmark('pm.interpolate')
+def _pmInterpolate(p):
+    grid = mesh(len(p))
+    grid.deposit(p.r, p.m)
+    grid.evalForce()
+    return lambda: grid.interpolate(p.r)
+
+@benchmark('step.bh')
+def _stepBH(p):
+    tree = LinearTree(Quad(-L,-L,2*L), leafSize=8, expansionOrder=2,
+                      rebuildInterval=4)
+    epsilon = L/np.sqrt(len(p))
+    def computeForce(particles):
+        tree.update(particles.r, particles.m)
+        particles.f[:] = particles.m[:,None]*treeAccel(tree, theta, epsilon)
+    computeForce(p)
+    return lambda: leapFrog(p, 0.01, computeForce)
+
+@benchmark('step.pm')
+def _stepPM(p):
+    grid = mesh(len(p))
+    def computeForce(particles):
+        grid.resetGrid()
+        grid.deposit(particles.r, particles.m)
+        grid.evalForce()
+        particles.f[:] = grid.interpolate(particles.r)
+    computeForce(p)
+    return lambda: leapFrog(p, 0.01, computeForce)
+
+#function: seconds per call, min and median of repeats, as timeit
+def measure(func, repeat=5, minTime=0.2):
+    #calls per sample, so that quick functions are timed over minTime
+    number = 1
+    while True:
+        t = time.perf_counter()
+        for i in range(number):
+            func()
+        elapsed = time.perf_counter() - t
+        if elapsed >= minTime or number >= 10**6:
+            break
+        number *= 10 if elapsed < minTime/10 else 2
+    samples = [elapsed/number]
+    for i in range(repeat - 1):
+        t = time.perf_counter()
+        for j in range(number):
+            func()
+        samples.append((time.perf_counter() - t)/number)
+    return min(samples), float(np.median(samples)), number
+
+#run metadata that must agree for times to be comparable
+sameRun = ('host', 'machine', 'numpy', 'backend', 'seed')
+
+#function: run benchmarks over sizes, list of result records
+def runAll(names, sizes, repeat=5, seed=0, log=sys.stdout):
+    results = []
+    for name in names:
+        setup, maxN = benchmarks[name]
+        for N in sizes:
+            if N > maxN:
+                continue
+            func = setup(galaxy(N, seed))
+            best, median, number = measure(func, repeat)
+            results.append({'name': name, 'N': N, 'min': best,
+                            'median': median, 'number': number, 'repeat': repeat})
+            log.write("%-16s N=%-8d %12.6f s\n" % (name, N, best))
+            log.flush()
+    return results
+
+#function: slowdowns of results against baseline beyond tolerance
+def compare(results, baseline, tolerance=0.1, log=sys.stdout, meta=None):
+    #################################################
+    # compares best times of matching (name, N),    #
+    # ratio > 1 + tolerance is a regression         #
+    # meta : metadata of results, None if runs      #
+    #        differing from baseline's are refused  #
+    #        to be compared                         #
+    #################################################
+    if meta is not None:
+        old = baseline.get('meta', {})
+        differ = [key for key in sameRun if old.get(key) != meta.get(key)]
+        if differ:
+            log.write("baseline not comparable, it differs in "
+                      +", ".join("%s (%s, now %s)" % (key, old.get(key), meta.get(key))
+                                 for key in differ)+"\n")
+            return None
+    old = {(r['name'], r['N']): r['min'] for r in baseline['results']}
+    regressions = []
+    for r in results:
+        key = (r['name'], r['N'])
+        if key not in old:
+            continue
+        ratio = r['min']/old[key]
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  SLOWER'
+            regressions.append(dict(r, ratio=ratio))
+        elif ratio < 1/(1 + tolerance):
+            flag = '  faster'
+        log.write("%-16s N=%-8d %8.3fx%s\n" % (r['name'], r['N'], ratio, flag))
+    return regressions
+
+#function: main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="N-body solver benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10**2, 10**3, 10**4, 10**5, 10**6])
+    parser.add_argument('--only', nargs='+', choices=sorted(benchmarks),
+                        default=list(benchmarks), help="benchmarks to run")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="write results to JSON file")
+    parser.add_argument('--baseline', help="compare against JSON results "
+                        "of the same host, numpy, backend and seed")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="fractional slowdown counted as regression")
+    args = parser.parse_args()
+
+    results = runAll(args.only, args.sizes, args.repeat, args.seed)
+    report = {'meta': {'python': platform.python_version(),
+                       'numpy': np.__version__,
+                       'host': platform.node(),
+                       'machine': platform.machine(),
+                       'platform': platform.platform(),
+                       'backend': getBackend().name,
+                       'seed': args.seed,
+                       'date': time.strftime('%Y-%m-%dT%H:%M:%S')},
+              'results': results}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, meta=report['meta'])
+        #non-zero exit status lets batch jobs catch slowdowns, or
+        #a baseline of another setup
+        sys.exit(2 if regressions is None else 1 if regressions else 0)
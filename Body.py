@@ -9,7 +9,6 @@
 
 #essential modules
 import numpy as np
-import matplotlib.pyplot as plt
 
 #gravitational force definition
 G = 6.674e-11 #N/m^2/kg^2
@@ -19,12 +18,52 @@ G = 0.449 #kpc^3/[kMs]/[10Myr]^2
 class Body:
     """definition for object with mass"""
     def __init__(self, mass, rx, ry, vx=0, vy=0, fx=0, fy=0, L=0, color='k'):
-        self.m = mass
-        self.r = np.array([rx,ry])
-        self.v = np.array([vx,vy])
-        self.f = np.array([fx,fy])
+        #standalone body owns its own one-row storage
+        self._m = np.array([mass], dtype=float)
+        self._r = np.array([rx,ry], dtype=float)
+        self._v = np.array([vx,vy], dtype=float)
+        self._f = np.array([fx,fy], dtype=float)
         self.L = L
         self.c = color
+
+    @classmethod
+    def view(cls, particles, i):
+        #lightweight body sharing row i of a ParticleSet's arrays
+        body = cls.__new__(cls)
+        body._m = particles.m[i:i+1]
+        body._r = particles.r[i]
+        body._v = particles.v[i]
+        body._f = particles.f[i]
+        body.L = particles.L
+        body.c = particles.c
+        return body
+
+    #state is written in place so views stay attached to their set
+    @property
+    def m(self):
+        return self._m[0]
+    @m.setter
+    def m(self, mass):
+        self._m[0] = mass
+    @property
+    def r(self):
+        return self._r
+    @r.setter
+    def r(self, r):
+        self._r[:] = r
+    @property
+    def v(self):
+        return self._v
+    @v.setter
+    def v(self, v):
+        self._v[:] = v
+    @property
+    def f(self):
+        return self._f
+    @f.setter
+    def f(self, f):
+        self._f[:] = f
+
     def update(self, dt):
         #update position velocity using Euler-Cromer
         self.v = self.v + (self.f/self.m)*dt
@@ -44,7 +83,7 @@ class Body:
     
     def resetForce(self, fx=0, fy=0):
         #reset force to zero
-        self.f = np.array([fx, fy])
+        self.f = (fx, fy)
     def addForce(self, body, epsilon):
         #force on self from body
         dr = self.r-body.r
@@ -73,6 +112,8 @@ class Body:
             return False
 
     def plot(self):
+        #plotting only needed here, so imported here
+        import matplotlib.pyplot as plt
         rx, ry = self.r[0], self.r[1]
         #vx, vy = self.v[0], self.v[1]
         #v = np.sqrt(self.v[0]**2+self.v[1]**2)
@@ -14,13 +14,11 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from time import clock
+from time import perf_counter as clock
 
 #essential imports
-from Body import Body
-from Quad import Quad
-from BHTree import BHTree
-from MCgalaxy import generateGalaxy
+from MCgalaxy import galaxyParticles
+from Backends import getBackend
 
 #function: main
 if __name__ == '__main__':
@@ -38,32 +36,25 @@ if __name__ == '__main__':
     T = 100.0 #10Myr
     steps = int(T/dt)
     #generate 1000 masses in 15kpc box
-    bodies = generateGalaxy(r0, m0, N, L)
+    particles = galaxyParticles(r0, m0, N, L)
     
     #plot galactic bodies, initial distribution
-    for body in bodies:
+    for body in particles:
         body.plot()
     plt.xlim([-L,L])
     plt.ylim([-L,L])
     plt.show()
 
     #test BH tree construction/traversal speed
-    nums = range(1,101)+range(101,1001,10)
+    nums = list(range(1,101))+list(range(101,1001,10))
     timesForce = []
     for i in range(len(nums)):
         num = nums[i]
-        print "Computing number "+str(num)+"/1000"
-        bodies = generateGalaxy(r0, m0, num, L)
-        #compute all forces between pairs
+        print("Computing number "+str(num)+"/1000")
+        particles = galaxyParticles(r0, m0, num, L)
+        #compute all forces between pairs, with NBODY_BACKEND kernels
         t_start = clock()
-        for body in bodies:
-            #pick a body
-            body.resetForce()
-            for other in bodies:
-                #pick any other body
-                if (body.r != other.r).any():
-                    #don't compute self forces
-                    body.addForce(other, epsilon)
+        particles.f[:] = particles.m[:,None]*getBackend().pairAccel(particles.r, particles.m, epsilon)
         t_end = clock()
         timesForce.append(t_end - t_start)
     plt.plot(nums, timesForce)
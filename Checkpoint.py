@@ -0,0 +1,70 @@
+#################################################################
+# Name:     Checkpoint.py                                       #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program saves and restores the full state of an     #
+#           N-body simulation between time steps, so that a     #
+#           stopped run continues exactly as if never stopped.  #
+#################################################################
+
+#essential modules
+import os
+import numpy as np
+
+#essential imports
+from Particles import ParticleSet
+import Profiler
+
+#################################################################
+# A checkpoint is an .npz archive of the particle arrays, with  #
+# forces at the current positions (the kick-drift-kick phase),  #
+# step, time, state of the global numpy random generator, and   #
+# the state() of any other object as arrays named object.key.   #
+# Checkpoints are only taken between whole steps.               #
+#################################################################
+
+#function: write checkpoint atomically, replacing any previous one
+@Profiler.timed('io.checkpoint')
+def save(path, particles, step, t, **states):
+    arrays = {'m': particles.m, 'r': particles.r, 'v': particles.v,
+              'f': particles.f, 'L': particles.L, 'step': step, 't': t}
+    #random state used by galaxyParticles and other initial conditions
+    name, keys, pos, hasGauss, gauss = np.random.get_state()
+    arrays.update({'random.keys': keys, 'random.pos': pos,
+                   'random.hasGauss': hasGauss, 'random.gauss': gauss})
+    for obj, state in states.items():
+        for key, value in state.items():
+            arrays[obj+'.'+key] = value
+    #write next to the target and rename over it, so a crash leaves
+    #either the old or the new checkpoint, never half of one
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+#function: read checkpoint, restoring the random state
+def load(path, restoreRandom=True):
+    #################################################
+    # returns particles, step, t and a dict of      #
+    # states by object name for their restore()     #
+    #################################################
+    with np.load(path) as data:
+        arrays = {}
+        for key in data.files:
+            a = data[key]
+            arrays[key] = a.item() if a.ndim == 0 else a
+    particles = ParticleSet(arrays.pop('m'), arrays.pop('r'), arrays.pop('v'),
+                            arrays.pop('f'), L=arrays.pop('L'))
+    step, t = arrays.pop('step'), arrays.pop('t')
+    states = {}
+    for key, value in arrays.items():
+        obj, name = key.split('.', 1)
+        states.setdefault(obj, {})[name] = value
+    random = states.pop('random')
+    if restoreRandom:
+        np.random.set_state(('MT19937', random['keys'], random['pos'],
+                             random['hasGauss'], random['gauss']))
+    return particles, step, t, states
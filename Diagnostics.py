@@ -0,0 +1,127 @@
+#################################################################
+# Name:     Diagnostics.py                                      #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program tracks energy, momentum, angular momentum   #
+#           and virial ratio of an N-body simulation over time, #
+#           with potentials from the tree or the mesh solver.   #
+#################################################################
+
+#essential modules
+import json
+import numpy as np
+
+#essential imports
+from TreeWalk import treePotential
+import Profiler
+
+#################################################################
+# Velocities are those at whole steps, as left by the kick-     #
+# drift-kick integrators. Potential energies come from the      #
+# solver already used for forces, so a diagnostic costs about   #
+# one more force evaluation rather than a sum over all pairs:   #
+#  tree: U = 1/2 sum m phi, phi from the Barnes-Hut walk        #
+#  mesh: U = -1/2 sum psi, psi the mesh potential at the bodies #
+# Mesh forces are f = grad psi on every body whatever its mass, #
+# so the mesh energy is the one they conserve for equal masses, #
+# as in galaxyParticles. It includes a near constant self term. #
+#################################################################
+
+#function: kinetic energy
+def kinetic(m, v):
+    return 0.5*(m*(v*v).sum(axis=1)).sum()
+
+#function: total linear momentum (2,)
+def momentum(m, v):
+    return (m[:,None]*v).sum(axis=0)
+
+#function: total angular momentum about the origin, out of plane
+def angularMomentum(m, r, v):
+    return (m*(r[:,0]*v[:,1] - r[:,1]*v[:,0])).sum()
+
+#function: potential energy from Barnes-Hut tree built on the bodies
+def treeEnergy(tree, m, theta, epsilon, groupSize=16):
+    #m in original body order, as the tree was built
+    return 0.5*(m*treePotential(tree, theta, epsilon, groupSize)).sum()
+
+#function: potential energy from mesh potential of last evalForce
+def meshEnergy(grid, r, kernel=None):
+    idx, w = grid.stencil(r, kernel)
+    psi = (grid.potential.ravel()[idx]*w).sum(axis=1)
+    return -0.5*psi.sum()
+
+#class: time series of conserved quantities
+class Diagnostics:
+    """energy, momentum and virial ratio every few steps"""
+    def __init__(self, potential=None, every=1, path=None, append=False,
+                 lastStep=None):
+        #################################################
+        # potential : function of particles returning   #
+        #             potential energy, None to record  #
+        #             kinetic quantities only           #
+        # every : steps between records                 #
+        # path : optional JSON lines file of records    #
+        # append : continue file, its records reloaded  #
+        # lastStep : on append, drop records after this #
+        #            step, as the checkpoint resumed    #
+        #################################################
+        self.potential = potential
+        self.every = every
+        self.series = []
+        #energy of first record, drift is measured against it
+        self.E0 = None
+        self.file = None
+        if path and append:
+            self.file, self.series = Profiler.openRecords(path, lastStep)
+        elif path:
+            self.file = open(path, 'w')
+
+    @Profiler.timed('diagnostics')
+    def measure(self, particles, step=0, t=0.0):
+        #record of particles now, whatever the cadence
+        m, r, v = particles.m, particles.r, particles.v
+        K = kinetic(m, v)
+        P = momentum(m, v)
+        rec = {'step': int(step), 't': float(t), 'K': float(K),
+               'px': float(P[0]), 'py': float(P[1]),
+               'Lz': float(angularMomentum(m, r, v))}
+        if self.potential is not None:
+            U = float(self.potential(particles))
+            E = K + U
+            if self.E0 is None:
+                self.E0 = E
+            rec.update({'U': U, 'E': E, 'virial': -2*K/U if U else np.nan,
+                        'dE': (E - self.E0)/abs(self.E0) if self.E0 else 0.0})
+        self.series.append(rec)
+        if self.file:
+            self.file.write(json.dumps(rec)+"\n")
+            self.file.flush()
+        return rec
+
+    def __call__(self, particles, step, t=0.0):
+        #record at cadence, None on other steps
+        if step % self.every:
+            return None
+        return self.measure(particles, step, t)
+
+    def column(self, key):
+        #array of one quantity over the recorded steps
+        return np.array([rec.get(key, np.nan) for rec in self.series])
+
+    def state(self):
+        #reference energy, so drift continues across a restart
+        return {} if self.E0 is None else {'E0': self.E0}
+    def restore(self, state):
+        if 'E0' in state:
+            self.E0 = float(state['E0'])
+        return self
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
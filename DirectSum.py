@@ -0,0 +1,74 @@
+#################################################################
+# Name:     DirectSum.py                                        #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program computes forces and potential energy of N   #
+#           bodies interacting under gravity by direct pairwise #
+#           summation, tile by tile with bounded memory.        #
+#################################################################
+
+#essential modules
+import numpy as np
+
+#essential imports
+from Body import G
+import Profiler
+
+#function: softened pair interactions between two tiles of bodies
+def _pairs(ri, rj, epsilon):
+    #separations and squared softened distances, each (ni,nj)
+    dx = np.subtract.outer(ri[:,0], rj[:,0])
+    dy = np.subtract.outer(ri[:,1], rj[:,1])
+    d2 = dx*dx
+    d2 += dy*dy
+    d2 += epsilon**2
+    return dx, dy, d2
+
+#function: accelerations of sink bodies from every body, tile by tile
+@Profiler.timed('direct')
+def directAccel(r, m, epsilon, tile=1024, sinks=None):
+    #################################################
+    # r : (N,2) positions, m : (N,) masses          #
+    # epsilon : softening length                    #
+    # tile : bodies per tile, memory ~ tile^2       #
+    # sinks : optional indices of bodies to compute #
+    #################################################
+    r = np.asarray(r, dtype=float)
+    m = np.asarray(m, dtype=float)
+    rs = r if sinks is None else r[sinks]
+    acc = np.zeros(rs.shape)
+    Profiler.count('direct.body', len(rs)*len(r))
+    for i in range(0, len(rs), tile):
+        ri = rs[i:i+tile]
+        for j in range(0, len(r), tile):
+            dx, dy, d2 = _pairs(ri, r[j:j+tile], epsilon)
+            #m_j/d^3, coincident bodies exert no force, as in BruteForce
+            d3 = np.sqrt(d2)
+            d3 *= d2
+            w = np.zeros_like(d3)
+            np.divide(m[j:j+tile], d3, out=w, where=d3 > 0)
+            acc[i:i+tile,0] -= G*np.einsum('ij,ij->i', w, dx)
+            acc[i:i+tile,1] -= G*np.einsum('ij,ij->i', w, dy)
+    #################################################
+    # acc : (N,2) accelerations of sinks            #
+    #################################################
+    return acc
+
+#function: total potential energy, summing each pair once
+def directPotential(r, m, epsilon=0.0, tile=1024):
+    r = np.asarray(r, dtype=float)
+    m = np.asarray(m, dtype=float)
+    U = 0.0
+    for i in range(0, len(r), tile):
+        #only tiles on or above the diagonal, pairs are symmetric
+        for j in range(i, len(r), tile):
+            d2 = _pairs(r[i:i+tile], r[j:j+tile], epsilon)[2]
+            d = np.sqrt(d2)
+            inv = np.zeros_like(d)
+            np.divide(1.0, d, out=inv, where=d > 0)
+            if i == j:
+                #pairs j > k within a diagonal tile
+                inv = np.triu(inv, 1)
+            U -= G*m[i:i+tile].dot(inv).dot(m[j:j+tile])
+    return U
@@ -0,0 +1,266 @@
+#################################################################
+# Name:     Ensemble.py                                         #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program advances many independent realizations of  #
+#           an N-body system together, stacked along a leading  #
+#           array axis, with batched direct and PM solvers.     #
+#                                                               #
+#   python Ensemble.py --K 32 --N 1000 --solver pm --out e.npz  #
+#################################################################
+
+#essential modules
+import argparse
+import numpy as np
+
+#essential imports
+from Body import G
+from Particles import ParticleSet
+from PMGrid import Grid, greens
+from gradient import Deriv, SpectralGrad
+from Integrator import getIntegrator
+import Profiler
+
+#################################################################
+# An ensemble holds K realizations of N bodies each as arrays   #
+# m (K,N), r, v, f (K,N,2). The integrators of Integrator.py    #
+# step it like a ParticleSet, every member at once, except      #
+# BlockStep whose levels are per body of one set. Members never #
+# interact, each solver works on every member separately.       #
+#################################################################
+
+#class: K stacked realizations of N bodies
+class ParticleEnsemble:
+    """masses, positions, velocities and forces of K sets of N bodies"""
+    def __init__(self, m, r, v=None, f=None, L=0):
+        self.r = np.array(r, dtype=float)
+        K, N = self.r.shape[:2]
+        self.m = np.array(np.broadcast_to(m, (K, N)), dtype=float)
+        self.v = np.zeros((K, N, 2)) if v is None else np.array(v, dtype=float)
+        self.f = np.zeros((K, N, 2)) if f is None else np.array(f, dtype=float)
+        #half length of periodic box
+        self.L = L
+
+    @classmethod
+    def fromParticles(cls, sets):
+        #stack particle sets of equal size
+        if len(set(len(p) for p in sets)) != 1:
+            raise ValueError("ensemble members must have equal numbers of bodies")
+        return cls(np.stack([p.m for p in sets]), np.stack([p.r for p in sets]),
+                   np.stack([p.v for p in sets]), np.stack([p.f for p in sets]),
+                   L=sets[0].L)
+
+    def __len__(self):
+        #number of realizations
+        return len(self.m)
+    def member(self, k):
+        #copy of realization k as a particle set
+        return ParticleSet(self.m[k], self.r[k], self.v[k], self.f[k], L=self.L)
+
+#function: ensemble of galaxies as galaxyParticles, one seed per member
+def galaxyEnsemble(r0, m0, N, L, K, seed=0):
+    #################################################
+    # member k is drawn from seed + k alone, so it  #
+    # is the same whatever K. Radii come from the   #
+    # exponential disc truncated at L rather than   #
+    # discarding bodies outside, so that every      #
+    # member keeps exactly N bodies                 #
+    #################################################
+    r = np.empty((K, N))
+    theta = np.empty((K, N))
+    for k in range(K):
+        rng = np.random.RandomState(seed + k)
+        r[k] = -r0*np.log(1.0 - rng.rand(N)*(1.0 - np.exp(-L/r0)))
+        theta[k] = 2.0*np.pi*rng.rand(N)
+    #velocity from naive estimate v ~ sqrt(GMgalaxy/r)
+    v = 4.738*np.exp(-r0/r)/np.sqrt(r)
+    pos = np.stack([r*np.cos(theta), r*np.sin(theta)], axis=-1)
+    vel = np.stack([-v*np.sin(theta), v*np.cos(theta)], axis=-1)
+    return ParticleEnsemble(m0/N, pos, vel, L=L)
+
+#function: accelerations of every member by direct summation
+@Profiler.timed('direct')
+def directAccel(r, m, epsilon, pairs=2**16):
+    #################################################
+    # r : (K,N,2) positions, m : (K,N) masses       #
+    # pairs : pairs per block, blocks of several    #
+    #         small members or tiles of large ones, #
+    #         small enough to stay in cache         #
+    #################################################
+    r = np.asarray(r, dtype=float)
+    m = np.asarray(m, dtype=float)
+    K, N = m.shape
+    tile = min(N, max(16, int(np.sqrt(pairs))))
+    batch = max(1, pairs//(tile*tile))
+    #contiguous coordinates, so pair arrays are built at full speed
+    x, y = np.ascontiguousarray(r[...,0]), np.ascontiguousarray(r[...,1])
+    acc = np.zeros(r.shape)
+    Profiler.count('direct.body', K*N*N)
+    for k in range(0, K, batch):
+        ks = slice(k, k+batch)
+        for i in range(0, N, tile):
+            for j in range(0, N, tile):
+                #pair separations of a batch of members, (k,ni,nj)
+                dx = x[ks,i:i+tile,None] - x[ks,None,j:j+tile]
+                dy = y[ks,i:i+tile,None] - y[ks,None,j:j+tile]
+                d2 = dx*dx
+                d2 += dy*dy
+                d2 += epsilon**2
+                d3 = np.sqrt(d2)
+                d3 *= d2
+                w = np.zeros_like(d3)
+                np.divide(m[ks,None,j:j+tile], d3, out=w, where=d3 > 0)
+                #m_j dx/d^3 summed over sources
+                dx *= w
+                dy *= w
+                acc[ks,i:i+tile,0] -= G*dx.sum(axis=2)
+                acc[ks,i:i+tile,1] -= G*dy.sum(axis=2)
+    return acc
+
+#function: potential energy of every member (K,), each pair once
+def directPotential(r, m, epsilon=0.0):
+    U = np.zeros(len(m))
+    #one member at a time bounds memory by N^2
+    for k in range(len(m)):
+        dx = r[k,:,None,0] - r[k,None,:,0]
+        dy = r[k,:,None,1] - r[k,None,:,1]
+        d2 = dx*dx + dy*dy + epsilon**2
+        d = np.sqrt(np.triu(d2, 1))
+        inv = np.zeros_like(d)
+        np.divide(1.0, d, out=inv, where=d > 0)
+        U[k] = -G*m[k].dot(inv).dot(m[k])
+    return U
+
+#class: particle meshes of every member, solved in one batched FFT
+class EnsembleMesh:
+    """K grids as PMGrid.Grid, stacked (K,Mx,My)"""
+    def __init__(self, K, shape, rx, ry, D, kernel='cic', gradient='onesided', order=2):
+        #one member grid checks options and assigns bodies to points
+        self.grid = Grid(np.zeros(shape), rx, ry, D, kernel=kernel,
+                         gradient=gradient, order=order)
+        self.K = K
+        self.D = D
+        self.array = np.zeros((K,) + tuple(shape))
+
+    def resetGrid(self):
+        self.array = np.zeros(self.array.shape)
+
+    @Profiler.timed('pm.deposit')
+    def deposit(self, positions, masses):
+        #every member's bodies onto its own grid, one bincount in all
+        K, N = np.shape(masses)
+        size = self.grid.array.size
+        idx, w = self.grid.stencil(np.reshape(positions, (K*N, 2)))
+        idx += np.repeat(np.arange(K)*size, N)[:,None]
+        w = w*np.reshape(masses, (K*N, 1))
+        mass = np.bincount(idx.ravel(), w.ravel(), minlength=K*size)
+        self.array = self.array + mass.reshape(self.array.shape)
+
+    def evalForce(self):
+        #as Grid.evalForce, transforms of all members batched
+        shape = self.grid.array.shape
+        density = self.array/self.D**2
+        with Profiler.phase('pm.fft'):
+            density_fft = (1.0/shape[0])*np.fft.rfft2(density)
+            potential_fft = density_fft*greens(shape, self.D)
+            potential = np.fft.irfft2(potential_fft, s=shape)
+        with Profiler.phase('pm.gradient'):
+            if self.grid.gradient == 'spectral':
+                force_x, force_y = SpectralGrad(potential_fft, shape, self.D)
+            else:
+                force_x = Deriv(potential, self.D, 1, self.grid.order, self.grid.gradient)
+                force_y = Deriv(potential, self.D, 2, self.grid.order, self.grid.gradient)
+        self.potential = potential
+        self.forces = np.stack([force_x, force_y], axis=-1)
+
+    @Profiler.timed('pm.interpolate')
+    def interpolate(self, positions):
+        #grid forces at all bodies (K,N,2)
+        K, N = np.shape(positions)[:2]
+        size = self.grid.array.size
+        idx, w = self.grid.stencil(np.reshape(positions, (K*N, 2)))
+        idx += np.repeat(np.arange(K)*size, N)[:,None]
+        forces = self.forces.reshape(-1, 2)[idx]
+        return (forces*w[...,None]).sum(axis=1).reshape(K, N, 2)
+
+    def energy(self, positions):
+        #mesh potential energy of every member (K,), as meshEnergy
+        K, N = np.shape(positions)[:2]
+        size = self.grid.array.size
+        idx, w = self.grid.stencil(np.reshape(positions, (K*N, 2)))
+        idx += np.repeat(np.arange(K)*size, N)[:,None]
+        psi = (self.potential.ravel()[idx]*w).sum(axis=1)
+        return -0.5*psi.reshape(K, N).sum(axis=1)
+
+#function: force evaluation and potential energy of an ensemble solver
+def makeSolver(kind, ensemble, epsilon, D=None, kernel='cic'):
+    #################################################
+    # returns computeForce(ensemble) filling f, and #
+    # potential(ensemble) giving energies (K,) from #
+    # the state of the last computeForce            #
+    #################################################
+    K, N = ensemble.m.shape
+    L = ensemble.L
+    if kind == 'direct':
+        def computeForce(ens):
+            ens.f[:] = ens.m[...,None]*directAccel(ens.r, ens.m, epsilon)
+        def potential(ens):
+            return directPotential(ens.r, ens.m, epsilon)
+        return computeForce, potential
+    if kind == 'pm':
+        #grids as PMSim, two spare cells past the box
+        D = D if D else L/np.sqrt(N)
+        M = int(np.ceil(2*L/D)) + 2
+        mesh = EnsembleMesh(K, (M, M), -L, -L, D, kernel=kernel)
+        def computeForce(ens):
+            mesh.resetGrid()
+            mesh.deposit(ens.r, ens.m)
+            mesh.evalForce()
+            ens.f[:] = mesh.interpolate(ens.r)
+        def potential(ens):
+            return mesh.energy(ens.r)
+        return computeForce, potential
+    raise ValueError("unknown solver '"+str(kind)+"', choose from direct, pm")
+
+#function: advance ensemble, energies (steps//every+1, K) over time
+def run(ensemble, dt, steps, computeForce, potential=None,
+        integrator='leapfrog', every=1):
+    step = getIntegrator(integrator)
+    computeForce(ensemble)
+    def energy():
+        K = 0.5*(ensemble.m*(ensemble.v*ensemble.v).sum(axis=-1)).sum(axis=1)
+        return K + potential(ensemble) if potential else K
+    E = [energy()]
+    for i in range(steps):
+        step(ensemble, dt, computeForce)
+        if (i+1) % every == 0:
+            E.append(energy())
+    return np.array(E)
+
+#function: main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="ensemble of galaxy realizations")
+    parser.add_argument('--K', type=int, default=32, help="realizations")
+    parser.add_argument('--N', type=int, default=1000, help="bodies per realization")
+    parser.add_argument('--solver', choices=('direct', 'pm'), default='pm')
+    parser.add_argument('--integrator', default='leapfrog')
+    parser.add_argument('--dt', type=float, default=0.1)
+    parser.add_argument('--T', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=0, help="seed of first member")
+    parser.add_argument('--every', type=int, default=10, help="steps between energies")
+    parser.add_argument('--out', help="final members and energies to .npz")
+    args = parser.parse_args()
+
+    #Milky Way parameters, as BHSim and PMSim
+    r0, m0, L = 3.0, 50.0, 15.0
+    ens = galaxyEnsemble(r0, m0, args.N, L, args.K, args.seed)
+    epsilon = L/np.sqrt(args.N)
+    computeForce, potential = makeSolver(args.solver, ens, epsilon)
+    E = run(ens, args.dt, int(round(args.T/args.dt)), computeForce, potential,
+            args.integrator, args.every)
+    drift = (E[-1] - E[0])/np.abs(E[0])
+    print("energy drift over members: mean "+str(drift.mean())+" std "+str(drift.std()))
+    if args.out:
+        np.savez(args.out, m=ens.m, r=ens.r, v=ens.v, E=E,
+                 seeds=args.seed + np.arange(args.K))
@@ -0,0 +1,242 @@
+#################################################################
+# Name:     FMM.py                                              #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program computes accelerations of N bodies with the #
+#           fast multipole method, using complex multipole and  #
+#           local expansions on a Quad hierarchy.               #
+#################################################################
+
+#essential modules
+import numpy as np
+from functools import lru_cache
+from math import comb
+
+#essential imports
+from Body import G
+from Quad import Quad
+from LinearTree import cellIndex, ranges
+import Profiler
+
+#################################################################
+# Complex expansions exist for harmonic potentials only, so the #
+# FMM solves 2D gravity: potential G m log|r|, acceleration     #
+#  a = -G m r/(r^2 + eps^2)                                     #
+# falling off as 1/r, rather than the 1/r^2 force of the plane  #
+# bodies in Body, BHTree and TreeWalk, the force law of the     #
+# Poisson mesh of PMGrid. It is a separate physical model, not  #
+# a faster route to the tree's forces: it cannot replace the bh #
+# tree walk at N >= 1e6 or any other N.                         #
+#                                                               #
+# With z = x + iy, the potential is Re f(z), f = sum m log(z-zi)#
+# and a = -G conj(f'(z)). A box of center c holds the multipole #
+#  f(z) = a0 log(z-c) + sum_k ak/(z-c)^k                        #
+# of its bodies, and the local expansion                        #
+#  f(z) = sum_l bl (z-c)^l                                      #
+# of every body far from it (Greengard & Rokhlin 1987). Boxes   #
+# are the quadrants of a Quad split evenly down to one leaf    #
+# level, children SW, SE, NW, NE. The constant b0 is dropped    #
+# since only f' is needed.                                      #
+#################################################################
+
+#function: multipole to multipole shift, child center c - parent center
+def _m2m(p, d):
+    T = np.zeros((p+1, p+1), dtype=complex)
+    T[0,0] = 1.0
+    for l in range(1, p+1):
+        T[0,l] = -d**l/l
+        for k in range(1, l+1):
+            T[k,l] = comb(l-1, k-1)*d**(l-k)
+    return T
+
+#function: multipole to local, source center - target center d
+def _m2l(p, d):
+    T = np.zeros((p+1, p+1), dtype=complex)
+    for l in range(1, p+1):
+        T[0,l] = -1.0/(l*d**l)
+        for k in range(1, p+1):
+            T[k,l] = (-1)**k*comb(l+k-1, k-1)/d**(l+k)
+    return T
+
+#function: local to local shift, child center - parent center d
+def _l2l(p, d):
+    T = np.zeros((p+1, p+1), dtype=complex)
+    for l in range(p+1):
+        for k in range(l, p+1):
+            T[k,l] = comb(k, l)*d**(k-l)
+    return T
+
+#child offsets (cx, cy) in SW, SE, NW, NE order
+_children = ((0, 0), (1, 0), (0, 1), (1, 1))
+
+#function: translation matrices of a level with box side h
+@lru_cache(maxsize=64)
+def _translations(p, h):
+    #child centers lie a quarter of the parent side from its center
+    m2m = [_m2m(p, complex(cx - 0.5, cy - 0.5)*0.5*h) for cx, cy in _children]
+    l2l = [_l2l(p, complex(cx - 0.5, cy - 0.5)*0.5*h) for cx, cy in _children]
+    #interaction list: children of the parent's neighbours that are
+    #not neighbours themselves, by offset and target parity
+    m2l = {}
+    for dx in range(-3, 4):
+        for dy in range(-3, 4):
+            if max(abs(dx), abs(dy)) > 1:
+                m2l[dx, dy] = _m2l(p, complex(dx, dy)*h)
+    return m2m, l2l, m2l
+
+#function: positions in sorted keys of wanted keys, -1 where absent
+def _lookup(keys, wanted):
+    i = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+    return np.where(keys[i] == wanted, i, -1)
+
+#################################################################
+# Only boxes holding bodies are stored, level by level, as      #
+# sorted keys ix*2^l + iy with their expansions, so memory grows #
+# as N times the number of levels however clustered the bodies. #
+#################################################################
+
+#function: near field of every body from bodies of neighbouring leaves
+def _nearField(rs, ms, ix, iy, keys, start, end, depth, epsilon, chunkSize):
+    count = end - start
+    acc = np.zeros((len(ms), 2))
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            #pairs of target and non-empty source leaves
+            jx, jy = ix + dx, iy + dy
+            inside = (jx >= 0) & (jx < 2**depth) & (jy >= 0) & (jy < 2**depth)
+            s = np.full(len(keys), -1)
+            s[inside] = _lookup(keys, jx[inside]*2**depth + jy[inside])
+            t = np.nonzero(s >= 0)[0]
+            s = s[t]
+            work = np.cumsum(count[t]*count[s])
+            a = 0
+            while a < len(t):
+                #whole target leaves until chunk is full, at least one
+                b = max(np.searchsorted(work, (work[a-1] if a else 0) + chunkSize), a + 1)
+                tc, sc = t[a:b], s[a:b]
+                sink = ranges(start[tc], end[tc])
+                srcBox = np.repeat(sc, count[tc])
+                src = ranges(start[srcBox], end[srcBox])
+                sink = np.repeat(sink, count[srcBox])
+                dr = rs[sink] - rs[src]
+                d2 = (dr*dr).sum(axis=1) + epsilon**2
+                #coincident bodies exert no force on each other
+                w = np.zeros_like(d2)
+                np.divide(ms[src], d2, out=w, where=d2 > 0)
+                acc[:,0] -= G*np.bincount(sink, w*dr[:,0], minlength=len(ms))
+                acc[:,1] -= G*np.bincount(sink, w*dr[:,1], minlength=len(ms))
+                a = b
+    return acc
+
+#function: accelerations of 2D logarithmic gravity by FMM
+@Profiler.timed('fmm')
+def fmmAccel(r, m, epsilon, order=12, quad=None, leafSize=16, maxDepth=16,
+             chunkSize=2**20):
+    #################################################
+    # r : (N,2) positions, m : (N,) masses          #
+    # epsilon : softening of near field pairs       #
+    # order : terms of expansions, error ~ 0.5^p    #
+    # quad : box holding every body, default the    #
+    #        smallest square around them            #
+    # leafSize : mean bodies sharing a body's leaf  #
+    #################################################
+    r = np.asarray(r, dtype=float)
+    m = np.asarray(m, dtype=float)
+    N, p = len(m), order
+    if quad is None:
+        lo, hi = r.min(axis=0), r.max(axis=0)
+        quad = Quad(lo[0], lo[1], (hi - lo).max()*(1.0 + 1e-9) + 1e-300)
+    #leaf level, at least 2 so interaction lists are not empty,
+    #refined until bodies meet about leafSize others in their leaf
+    fine = cellIndex(quad, r, maxDepth)
+    for depth in range(2, maxDepth + 1):
+        cell = fine >> (maxDepth - depth)
+        key = cell[:,0]*2**depth + cell[:,1]
+        count = np.unique(key, return_counts=True)[1]
+        if (count*count).sum() <= leafSize*N:
+            break
+    #bodies sorted by leaf
+    sort = np.argsort(key, kind='stable')
+    rs, ms, key, cell = r[sort], m[sort], key[sort], cell[sort]
+    keys, start = np.unique(key, return_index=True)
+    end = np.append(start[1:], N)
+    box = np.repeat(np.arange(len(keys)), end - start)
+    ix, iy = np.divmod(keys, 2**depth)
+    h = quad.L/2**depth
+    z = ((rs[:,0] - quad.r[0])/h - cell[:,0] - 0.5
+         + 1j*((rs[:,1] - quad.r[1])/h - cell[:,1] - 0.5))*h
+
+    #leaf multipoles, a0 = sum m, ak = -sum m dz^k/k
+    with Profiler.phase('fmm.p2m'):
+        M = np.zeros((len(keys), p+1), dtype=complex)
+        M[:,0] = np.bincount(box, ms)
+        w = -ms.astype(complex)
+        for k in range(1, p+1):
+            w = w*z
+            M[:,k] = np.bincount(box, w.real/k) + 1j*np.bincount(box, w.imag/k)
+    #upward pass, boxes of every level with their parent's position
+    levels = {depth: (ix, iy, M, None)}
+    with Profiler.phase('fmm.m2m'):
+        for l in range(depth, 1, -1):
+            cx, cy, child, _ = levels[l]
+            pkeys, parent = np.unique((cx >> 1)*2**(l-1) + (cy >> 1), return_inverse=True)
+            px, py = np.divmod(pkeys, 2**(l-1))
+            Mp = np.zeros((len(pkeys), p+1), dtype=complex)
+            position = (cx & 1) + 2*(cy & 1)
+            for c, T in enumerate(_translations(p, quad.L/2**(l-1))[0]):
+                sel = position == c
+                #at most one child of each parent in each position
+                Mp[parent[sel]] += child[sel] @ T
+            levels[l] = (cx, cy, child, (parent, position))
+            levels[l-1] = (px, py, Mp, None)
+    #downward pass, shift parent's expansion then add interaction list
+    with Profiler.phase('fmm.m2l'):
+        for l in range(2, depth+1):
+            bx, by, Ml, link = levels[l]
+            local = np.zeros_like(Ml)
+            if l > 2:
+                parent, position = link
+                for c, T in enumerate(_translations(p, quad.L/2**(l-1))[1]):
+                    sel = position == c
+                    local[sel] += parentLocal[parent[sel]] @ T
+            keysl = bx*2**l + by
+            m2l = _translations(p, quad.L/2**l)[2]
+            for qx in (0, 1):
+                for qy in (0, 1):
+                    t = np.nonzero(((bx & 1) == qx) & ((by & 1) == qy))[0]
+                    for dx in range(-2-qx, 4-qx):
+                        for dy in range(-2-qy, 4-qy):
+                            if max(abs(dx), abs(dy)) <= 1:
+                                continue
+                            jx, jy = bx[t] + dx, by[t] + dy
+                            inside = (jx >= 0) & (jx < 2**l) & (jy >= 0) & (jy < 2**l)
+                            s = _lookup(keysl, jx[inside]*2**l + jy[inside])
+                            found = s >= 0
+                            local[t[inside][found]] += Ml[s[found]] @ m2l[dx, dy]
+            parentLocal = local
+    #far field at bodies, f'(z) = sum l bl dz^(l-1) by Horner's rule
+    with Profiler.phase('fmm.l2p'):
+        df = np.zeros(N, dtype=complex)
+        for l in range(p, 0, -1):
+            df = df*z + l*local[box, l]
+    with Profiler.phase('fmm.p2p'):
+        acc = _nearField(rs, ms, ix, iy, keys, start, end, depth, epsilon, chunkSize)
+    far = -G*np.conj(df)
+    acc[:,0] += far.real
+    acc[:,1] += far.imag
+    out = np.empty_like(acc)
+    out[sort] = acc
+    return out
+
+#function: accelerations of 2D logarithmic gravity by direct summation
+def logDirectAccel(r, m, epsilon, sinks=None):
+    #reference for fmmAccel, memory ~ N*len(sinks)
+    r = np.asarray(r, dtype=float)
+    m = np.asarray(m, dtype=float)
+    rs = r if sinks is None else r[sinks]
+    dr = rs[:,None,:] - r[None,:,:]
+    d2 = (dr*dr).sum(axis=2) + epsilon**2
+    w = np.zeros_like(d2)
+    np.divide(m[None,:], d2, out=w, where=d2 > 0)
+    return -G*np.einsum('ij,ijk->ik', w, dr)
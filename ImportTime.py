@@ -0,0 +1,43 @@
+#################################################################
+# Name:     ImportTime.py                                       #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program measures how long each module of the N-body #
+#           code takes to import in a fresh interpreter, and    #
+#           whether it pulls in matplotlib.                     #
+#################################################################
+
+#essential modules
+import os
+import sys
+import subprocess
+
+#compute core, then the plotting import every module used to pay
+modules = ['Body', 'Quad', 'Particles', 'MCgalaxy', 'Integrator',
+           'DirectSum', 'LinearTree', 'TreeWalk', 'BHTree', 'gradient',
+           'PMGrid', 'TreePM', 'Parallel', 'Snapshot', 'Checkpoint',
+           'nbody', 'matplotlib.pyplot']
+
+#function: import time in seconds and whether matplotlib was loaded
+def importTime(module, repeat=5):
+    code = ("import sys, time\n"
+            "t = time.perf_counter()\n"
+            "import "+module+"\n"
+            "print(time.perf_counter() - t, 'matplotlib' in sys.modules)")
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for i in range(repeat):
+        #fresh interpreter each time, as a new worker process would be
+        out = subprocess.run([sys.executable, '-c', code], cwd=here, check=True,
+                             capture_output=True, text=True).stdout.split()
+        times.append(float(out[0]))
+    #best of repeats, the least disturbed by other processes
+    return min(times), out[1] == 'True'
+
+#function: main
+if __name__ == '__main__':
+    print("%-20s %10s  %s" % ("module", "import ms", "matplotlib"))
+    for module in modules:
+        t, plotting = importTime(module)
+        print("%-20s %10.1f  %s" % (module, 1e3*t, "yes" if plotting else "no"))
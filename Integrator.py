@@ -0,0 +1,167 @@
+#################################################################
+# Name:     Integrator.py                                       #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program advances every body of a particle set in    #
+#           time with batched array operations for N-body       #
+#           simulation.                                         #
+#################################################################
+
+#essential modules
+import numpy as np
+
+#essential imports
+import Profiler
+
+#Yoshida 4th order symplectic composition weights
+_cbrt2 = 2.0**(1.0/3.0)
+_w1 = 1.0/(2.0 - _cbrt2)
+_w0 = -_cbrt2/(2.0 - _cbrt2)
+
+#################################################################
+# Every integrator takes a particle set whose forces f already  #
+# hold the forces at the current positions, advances it by dt,  #
+# and leaves f holding the forces at the new positions.         #
+# computeForce(particles) must fill particles.f in place.       #
+#################################################################
+
+#function: wrap positions into periodic box of half length L
+def wrap(r, L):
+    if L > 0:
+        #same wrapping as Body.update, done in place
+        r += L
+        np.mod(r, 2*L, out=r)
+        r -= L
+    return r
+
+#function: velocity kick by force over time dt
+@Profiler.timed('kick')
+def kick(particles, dt):
+    particles.v += (particles.f/particles.m[...,None])*dt
+
+#function: position drift by velocity over time dt
+@Profiler.timed('drift')
+def drift(particles, dt):
+    particles.r += particles.v*dt
+    wrap(particles.r, particles.L)
+
+#function: Euler-Cromer step (same scheme as Body.update)
+def eulerCromer(particles, dt, computeForce):
+    kick(particles, dt)
+    drift(particles, dt)
+    computeForce(particles)
+
+#function: kick-drift-kick leapfrog step
+def leapFrog(particles, dt, computeForce):
+    kick(particles, 0.5*dt)
+    drift(particles, dt)
+    computeForce(particles)
+    kick(particles, 0.5*dt)
+
+#function: Yoshida 4th order symplectic step
+def yoshida(particles, dt, computeForce):
+    #three leapfrog substeps, one backwards in time
+    leapFrog(particles, _w1*dt, computeForce)
+    leapFrog(particles, _w0*dt, computeForce)
+    leapFrog(particles, _w1*dt, computeForce)
+
+#################################################################
+# Block time steps: body i advances by dt/2^level[i], with      #
+# levels picked from its acceleration and the softening. Every  #
+# sub-step ends on a tick of dt/2^maxLevel and only the bodies  #
+# whose step ends there are active and get new forces, from     #
+# computeForce(particles, active) filling particles.f[active]. #
+# All bodies are synchronised again at the end of dt.           #
+#################################################################
+
+#function: power of two step levels from accelerations and softening
+def stepLevels(f, m, dt, epsilon, eta=0.2, maxLevel=8):
+    #massless bodies feel no acceleration here and take the full step
+    a = np.zeros(len(m))
+    np.divide(np.sqrt((f*f).sum(axis=-1)), m, out=a, where=m > 0)
+    #wanted step eta sqrt(epsilon/|a|), rounded down to dt/2^level
+    ratio = dt*np.sqrt(a/epsilon)/eta
+    level = np.ceil(np.log2(np.maximum(ratio, 1.0)))
+    return np.clip(level, 0, maxLevel).astype(int)
+
+#class: hierarchical block time step integrator
+class BlockStep:
+    """kick-drift-kick leapfrog with power of two time step levels"""
+    def __init__(self, epsilon, eta=0.2, maxLevel=8):
+        self.epsilon = epsilon
+        self.eta = eta
+        self.maxLevel = maxLevel
+        #levels are kept between steps, set from forces on first call
+        self.levels = None
+        #number of single body force evaluations, for comparison
+        #with N per step of the global step integrators
+        self.forceEvaluations = 0
+        #finest level any body has taken, for the same comparison
+        self.finestLevel = 0
+
+    def __call__(self, particles, dt, computeForce):
+        #same contract as leapFrog, for computeForce taking active bodies
+        levels = self.levels
+        if levels is None or len(levels) != len(particles.m):
+            levels = stepLevels(particles.f, particles.m, dt, self.epsilon,
+                                self.eta, self.maxLevel)
+        ticks = 2**self.maxLevel
+        tick = dt/ticks
+        k = 0
+        while k < ticks:
+            #ticks per step of each body, steps start and end on multiples
+            span = 2**(self.maxLevel - levels)
+            start = np.nonzero(k % span == 0)[0]
+            with Profiler.phase('kick'):
+                particles.v[start] += (particles.f[start]/particles.m[start,None]
+                                       *(0.5*tick*span[start])[:,None])
+            #drift everyone to the next tick where some step ends
+            h = (span - k % span).min()
+            drift(particles, h*tick)
+            k += h
+            active = np.nonzero(k % span == 0)[0]
+            computeForce(particles, active)
+            self.forceEvaluations += len(active)
+            Profiler.count('active', len(active))
+            with Profiler.phase('kick'):
+                particles.v[active] += (particles.f[active]/particles.m[active,None]
+                                        *(0.5*tick*span[active])[:,None])
+            #new levels of finished bodies, finer at any tick but coarser
+            #only to levels whose steps start at tick k
+            want = stepLevels(particles.f[active], particles.m[active], dt,
+                              self.epsilon, self.eta, self.maxLevel)
+            if k < ticks:
+                aligned = self.maxLevel - int(np.log2(k & -k))
+            else:
+                aligned = 0
+            levels[active] = np.maximum(want, aligned)
+            self.finestLevel = max(self.finestLevel, int(levels.max()))
+        self.levels = levels
+        return particles
+
+    def state(self):
+        #levels and counter, to continue a run from checkpoint
+        state = {'forceEvaluations': self.forceEvaluations,
+                 'finestLevel': self.finestLevel}
+        if self.levels is not None:
+            state['levels'] = self.levels
+        return state
+
+    def restore(self, state):
+        self.levels = state.get('levels')
+        self.forceEvaluations = state['forceEvaluations']
+        self.finestLevel = int(state.get('finestLevel', 0))
+        return self
+
+#integrators by name
+integrators = {'euler': eulerCromer,
+               'leapfrog': leapFrog,
+               'yoshida': yoshida}
+
+#function: look up integrator by name
+def getIntegrator(name):
+    if name not in integrators:
+        raise ValueError("unknown integrator '"+str(name)+"', choose from "
+                         +", ".join(sorted(integrators)))
+    return integrators[name]
@@ -0,0 +1,265 @@
+#################################################################
+# Name:     LinearTree.py                                       #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program is object definition for a flat, array      #
+#           backed Barnes-Hut quadtree built from Morton sorted #
+#           bodies for Barnes-Hut N-body simulation.            #
+#################################################################
+
+#essential modules
+import numpy as np
+
+#essential imports
+from Quad import Quad
+import Profiler
+
+#function: spread lower 32 bits of integers to even bit positions
+def _part1by1(x):
+    x = x.astype(np.uint64) & np.uint64(0x00000000FFFFFFFF)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x3333333333333333)
+    x = (x | (x << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return x
+
+#function: Morton (Z-order) key of integer cell coordinates
+def mortonKey(ix, iy):
+    #x in even bits, y in odd bits, so child order is SW, SE, NW, NE
+    return _part1by1(ix) | (_part1by1(iy) << np.uint64(1))
+
+#function: integer cell coordinates of positions in quad
+def cellIndex(quad, r, depth):
+    n = 2**depth
+    cell = np.floor((r - quad.r)*(n/quad.L)).astype(np.int64)
+    return np.clip(cell, 0, n-1)
+
+#function: concatenate index ranges [start, end)
+def ranges(start, end):
+    counts = end - start
+    offsets = np.repeat(start - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(counts.sum())
+
+#function: reduce array rows over non-empty index ranges [start, end)
+def rangeReduce(ufunc, a, start, end):
+    #reduce along the contiguous axis, one column at a time
+    a = np.ascontiguousarray(np.moveaxis(a, 0, -1))
+    #pad so that end == len(a) is a valid reduceat index
+    pad = np.concatenate([a, np.zeros(a.shape[:-1]+(1,), a.dtype)], axis=-1)
+    idx = np.empty(2*len(start), dtype=np.int64)
+    idx[0::2] = start
+    idx[1::2] = end
+    return np.moveaxis(ufunc.reduceat(pad, idx, axis=-1)[...,0::2], -1, 0)
+
+#function: sum of array rows over index ranges [start, end)
+def rangeSum(a, start, end):
+    return rangeReduce(np.add, a, start, end)
+
+#class: flat Barnes-Hut quadtree
+class LinearTree:
+    """array-backed Barnes-Hut quadtree over Morton sorted bodies"""
+    def __init__(self, quad, leafSize=1, maxDepth=20, expansionOrder=0,
+                 rebuildInterval=1, rebuildGrowth=0.1):
+        self.quad = quad
+        #most bodies held by an external node
+        self.leafSize = leafSize
+        #deepest level of subdivision, at most 32
+        self.maxDepth = maxDepth
+        #multipole order of node expansions: 0 monopole, 2 quadrupole
+        #(the dipole about the center of mass vanishes, so 1 is 0)
+        if expansionOrder not in (0, 1, 2):
+            raise ValueError("expansionOrder must be 0, 1 or 2")
+        self.expansionOrder = expansionOrder
+        #update() rebuilds every rebuildInterval calls, or sooner once
+        #refitted nodes grew by more than rebuildGrowth on average
+        self.rebuildInterval = rebuildInterval
+        self.rebuildGrowth = rebuildGrowth
+
+    @Profiler.timed('tree.build')
+    def build(self, r, m):
+        #build tree over positions r (N,2) and masses m (N,)
+        r = np.asarray(r, dtype=float)
+        m = np.asarray(m, dtype=float)
+        D = self.maxDepth
+        #sort bodies along Morton curve
+        cells = cellIndex(self.quad, r, D)
+        keys = mortonKey(cells[:,0], cells[:,1])
+        if getattr(self, 'order', None) is not None and len(self.order) == len(keys):
+            #start from previous order, only bodies that crossed a
+            #quadrant boundary move, which the stable sort does quickly
+            self.order = self.order[np.argsort(keys[self.order], kind='stable')]
+        else:
+            self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.cells = cells[self.order]
+        self.r = r[self.order]
+        self.m = m[self.order]
+        N = len(self.m)
+
+        #root node holds every body
+        start, end = [np.array([0])], [np.array([N])]
+        level, parent = [np.array([0])], [np.array([-1])]
+        child, nchild = [], []
+        count = 1
+        ids, s, e = np.array([0]), start[0], end[0]
+        for l in range(1, D+1):
+            #nodes at previous level with too many bodies get children
+            mask = (e - s) > self.leafSize
+            first = np.full(len(s), -1)
+            num = np.zeros(len(s), dtype=int)
+            if not mask.any():
+                child.append(first)
+                nchild.append(num)
+                break
+            pid = np.nonzero(mask)[0]
+            idx = ranges(s[pid], e[pid])
+            owner = np.repeat(ids[pid], (e - s)[pid])
+            #bodies sharing a key prefix at this level share a child
+            prefix = self.keys[idx] >> np.uint64(2*(D-l))
+            new = np.empty(len(idx), dtype=bool)
+            new[0] = True
+            new[1:] = prefix[1:] != prefix[:-1]
+            heads = np.nonzero(new)[0]
+            cs = idx[heads]
+            ce = np.append(idx[heads[1:]-1], idx[-1]) + 1
+            cp = owner[heads]
+            #children of one parent are contiguous in node order
+            ids_c = count + np.arange(len(cs))
+            _, at, num_p = np.unique(cp, return_index=True, return_counts=True)
+            first[pid] = ids_c[at]
+            num[pid] = num_p
+            child.append(first)
+            nchild.append(num)
+            start.append(cs)
+            end.append(ce)
+            level.append(np.full(len(cs), l))
+            parent.append(cp)
+            count += len(cs)
+            ids, s, e = ids_c, cs, ce
+        else:
+            child.append(np.full(len(s), -1))
+            nchild.append(np.zeros(len(s), dtype=int))
+
+        #node arrays
+        self.start = np.concatenate(start)
+        self.end = np.concatenate(end)
+        self.level = np.concatenate(level)
+        self.parent = np.concatenate(parent)
+        self.child = np.concatenate(child)
+        self.nchild = np.concatenate(nchild)
+        self.external = self.nchild == 0
+        #first node of every level, nodes are stored level by level
+        self.levelStart = np.searchsorted(self.level, np.arange(self.level[-1]+2))
+        #external nodes in body order
+        leaves = np.nonzero(self.external)[0]
+        self.leaves = leaves[np.argsort(self.start[leaves])]
+        #geometry: lower left corner and side length of node quadrants
+        shift = D - self.level
+        corner = (self.cells[self.start] >> shift[:,None]) << shift[:,None]
+        self.cellSize = self.quad.L/2.0**self.level
+        self.size = self.cellSize
+        self.corner = self.quad.r + corner*(self.quad.L/2.0**D)
+        self.aggregate()
+        self.age = 0
+        return self
+
+    @Profiler.timed('tree.refit')
+    def refit(self, r, m):
+        #keep topology, move bodies and recompute node sums bottom-up
+        self.r = np.asarray(r, dtype=float)[self.order]
+        self.m = np.asarray(m, dtype=float)[self.order]
+        self.aggregate()
+        #bodies may have drifted out of their quadrant, so node size is
+        #the larger of its quadrant and the box around its bodies
+        s, e = self.start[self.leaves], self.end[self.leaves]
+        #max of (x, y, -x, -y) gives both corners of the box in one pass
+        box = np.hstack([self.r, -self.r])
+        box = self.upward(np.maximum, rangeReduce(np.maximum, box, s, e))
+        self.size = np.maximum(self.cellSize, (box[:,0:2] + box[:,2:4]).max(axis=1))
+        self.age += 1
+        return self
+
+    def update(self, r, m):
+        #refit tree to moved bodies, rebuilding when it has gone stale
+        if getattr(self, 'start', None) is None or self.age + 1 >= self.rebuildInterval:
+            return self.build(r, m)
+        self.refit(r, m)
+        #loose nodes are opened more often, rebuild once too loose
+        if (self.size/self.cellSize).mean() - 1 > self.rebuildGrowth:
+            return self.build(r, m)
+        return self
+
+    def upward(self, ufunc, values):
+        #combine values of external nodes up the tree
+        out = np.empty((len(self),) + values.shape[1:])
+        out[self.leaves] = values
+        ls = self.levelStart
+        for l in range(len(ls) - 3, -1, -1):
+            #children of level l nodes all sit in the level l+1 block
+            inner = ls[l] + np.nonzero(~self.external[ls[l]:ls[l+1]])[0]
+            if len(inner) == 0:
+                continue
+            c = self.child[inner] - ls[l+1]
+            out[inner] = rangeReduce(ufunc, out[ls[l+1]:ls[l+2]],
+                                     c, c + self.nchild[inner])
+        return out
+
+    def aggregate(self):
+        #mass, center of mass and multipoles of every node, summed
+        #bottom-up in one pass over a table of per-body moments
+        s, e = self.start[self.leaves], self.end[self.leaves]
+        #positions relative to root center keep the sums well conditioned
+        o = self.quad.r + 0.5*self.quad.L
+        x = self.r - o
+        m = self.m[:,None]
+        cols = [m, m*x, x]
+        if self.expansionOrder == 2:
+            cols.append(m*np.stack([x[:,0]*x[:,0], x[:,0]*x[:,1], x[:,1]*x[:,1]], axis=1))
+        S = self.upward(np.add, rangeSum(np.hstack(cols), s, e))
+        self.mass = S[:,0]
+        #massless nodes sit at the mean position of their bodies
+        count = (self.end - self.start)[:,None]
+        c = np.where(self.mass[:,None] > 0,
+                     S[:,1:3]/np.where(self.mass > 0, self.mass, 1)[:,None],
+                     S[:,3:5]/count)
+        self.com = o + c
+        if self.expansionOrder == 2:
+            #traceless quadrupole (Qxx, Qxy, Qyy) about center of mass
+            #Q_ij = sum m(3 d_i d_j - |d|^2 delta_ij), d = r - com
+            cc = np.stack([c[:,0]*c[:,0], c[:,0]*c[:,1], c[:,1]*c[:,1]], axis=1)
+            C = S[:,5:8] - self.mass[:,None]*cc
+            self.quadrupole = np.stack([2*C[:,0] - C[:,2],
+                                        3*C[:,1],
+                                        2*C[:,2] - C[:,0]], axis=1)
+
+    def state(self):
+        #arrays and age of built tree, to continue a run from checkpoint
+        state = {k: v for k, v in vars(self).items() if isinstance(v, np.ndarray)}
+        if 'start' in state:
+            state['age'] = self.age
+        return state
+
+    def restore(self, state):
+        #continue from state(), refits then match the original tree
+        for k, v in state.items():
+            setattr(self, k, v)
+        return self
+
+    def __len__(self):
+        #number of nodes
+        return len(self.start)
+
+    def nodeQuad(self, i):
+        #quadrant covered by node i
+        return Quad(self.corner[i,0], self.corner[i,1], self.cellSize[i])
+
+    def bodies(self, i):
+        #original indices of bodies held by node i
+        return self.order[self.start[i]:self.end[i]]
+
+    def plot(self):
+        #plot quadrants of every node
+        for i in range(len(self)):
+            self.nodeQuad(i).plot()
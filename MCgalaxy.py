@@ -11,42 +11,49 @@
 
 #essential modules
 import numpy as np
-import matplotlib.pyplot as plt
 
 #essential imports
 from Body import Body
+from Particles import ParticleSet
 
-#function: initialize array of bodies in a galaxy
-def generateGalaxy(r0, m0, N, L):
+#function: initialize particle set of bodies in a galaxy
+def galaxyParticles(r0, m0, N, L):
     #divide mass of galaxy among N masses
     m = m0/N
-    #generate N bodies
-    bodies = []
-    for i in range(N):
-        #position from normalized distribution p(R) = (1/r0)exp(-r/r0)
-        r = -r0*np.log(1.0-np.random.rand())
-        if r < L:
-            theta = 2.0*np.pi*np.random.rand()
-            rx = r*np.cos(theta)
-            ry = r*np.sin(theta)
-            #velocity from naive estimate v ~ sqrt(GMgalaxy/r)
-            v = 4.738*np.exp(-r0/r)/np.sqrt(r)
-            vx = -v*np.sin(theta)
-            vy = v*np.cos(theta)
-            #generate body
-            bodies.append(Body(m, rx, ry, vx=vx, vy=vy, L=L))
-    return bodies
+    #position from normalized distribution p(R) = (1/r0)exp(-r/r0)
+    r = -r0*np.log(1.0-np.random.rand(N))
+    #bodies outside the box are discarded
+    r = r[r < L]
+    theta = 2.0*np.pi*np.random.rand(len(r))
+    #velocity from naive estimate v ~ sqrt(GMgalaxy/r)
+    v = 4.738*np.exp(-r0/r)/np.sqrt(r)
+    #fill particle arrays directly
+    particles = ParticleSet.empty(len(r), L=L)
+    particles.m[:] = m
+    particles.r[:,0] = r*np.cos(theta)
+    particles.r[:,1] = r*np.sin(theta)
+    particles.v[:,0] = -v*np.sin(theta)
+    particles.v[:,1] = v*np.cos(theta)
+    return particles
 
-#function: initialize array of bodies in uniform box
-def generateUniform(rho, v0, N, L):
+#function: initialize array of bodies in a galaxy
+def generateGalaxy(r0, m0, N, L):
+    #bodies are views into one contiguous particle set
+    return galaxyParticles(r0, m0, N, L).bodies()
+
+#function: initialize particle set of bodies in uniform box
+def uniformParticles(rho, v0, N, L):
     #divide total among N masses
     m = rho*L**2/N
     #generate N bodies randomly distributed in box
-    bodies = []
-    for i in range(N):
-        vx, vy = np.random.rand()*2*v0-v0, np.random.rand()*2*v0-v0
-        rx, ry = np.random.rand()*2*L-L, np.random.rand()*2*L-L
-        #generate body
-        bodies.append(Body(m, rx, ry, vx=vx, vy=vy, L=L))
-    return bodies
+    particles = ParticleSet.empty(N, L=L)
+    particles.m[:] = m
+    particles.v[:] = np.random.rand(N,2)*2*v0-v0
+    particles.r[:] = np.random.rand(N,2)*2*L-L
+    return particles
+
+#function: initialize array of bodies in uniform box
+def generateUniform(rho, v0, N, L):
+    #bodies are views into one contiguous particle set
+    return uniformParticles(rho, v0, N, L).bodies()
     
@@ -0,0 +1,194 @@
+#################################################################
+# Name:     NumbaKernels.py                                     #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program compiles the hot force kernels of N-body    #
+#           simulation with Numba, as the 'numba' backend of    #
+#           Backends.py. Importing fails without numba.         #
+#################################################################
+
+#essential modules
+import numpy as np
+from numba import njit, prange
+
+#essential imports
+from Body import G
+from gradient import Grad
+import Profiler
+
+#function: softened accelerations of sinks from every body
+@njit(parallel=True, cache=True)
+def _pairAccel(rs, r, m, epsilon):
+    acc = np.zeros(rs.shape)
+    e2 = epsilon*epsilon
+    for i in prange(rs.shape[0]):
+        ax, ay = 0.0, 0.0
+        for j in range(r.shape[0]):
+            dx = rs[i,0] - r[j,0]
+            dy = rs[i,1] - r[j,1]
+            d2 = dx*dx + dy*dy + e2
+            #coincident bodies exert no force, as in DirectSum
+            if d2 > 0.0:
+                w = m[j]/(d2*np.sqrt(d2))
+                ax -= w*dx
+                ay -= w*dy
+        acc[i,0] = G*ax
+        acc[i,1] = G*ay
+    return acc
+
+#function: same as DirectSum.directAccel, tile is unused
+@Profiler.timed('direct')
+def pairAccel(r, m, epsilon, tile=1024, sinks=None):
+    r = np.ascontiguousarray(r, dtype=float)
+    m = np.ascontiguousarray(m, dtype=float)
+    rs = r if sinks is None else np.ascontiguousarray(r[sinks])
+    return _pairAccel(rs, r, m, float(epsilon))
+
+#function: Barnes-Hut walk of each sorted body down the tree arrays
+@njit(parallel=True, cache=True)
+def _treeWalk(start, end, external, child, nchild, com, mass, size,
+              quadrupole, order2, r, m, theta, epsilon, sinks):
+    acc = np.zeros((len(sinks), 2))
+    e2 = epsilon*epsilon
+    for s in prange(len(sinks)):
+        i = sinks[s]
+        #depth first stack, at most 3 siblings pending per level
+        stack = np.empty(4*64, dtype=np.int64)
+        stack[0] = 0
+        top = 1
+        ax, ay = 0.0, 0.0
+        while top > 0:
+            top -= 1
+            n = stack[top]
+            dx = r[i,0] - com[n,0]
+            dy = r[i,1] - com[n,1]
+            r2 = dx*dx + dy*dy
+            #nodes holding the body are never far from it
+            holds = start[n] <= i and i < end[n]
+            if not holds and size[n]*size[n] < theta*theta*r2:
+                s2 = r2 + e2
+                inv3 = 1.0/(s2*np.sqrt(s2))
+                ax -= mass[n]*inv3*dx
+                ay -= mass[n]*inv3*dy
+                if order2:
+                    #quadrupole term, as TreeWalk._farKernel
+                    qxx = quadrupole[n,0]
+                    qxy = quadrupole[n,1]
+                    qyy = quadrupole[n,2]
+                    t = qxx + qyy
+                    qx = qxx*dx + qxy*dy
+                    qy = qxy*dx + qyy*dy
+                    inv5 = inv3/s2
+                    xQx = dx*qx + dy*qy + t*r2
+                    c = 2.5*t - 2.5*xQx/s2
+                    ax += inv5*(qx + c*dx)
+                    ay += inv5*(qy + c*dy)
+            elif external[n]:
+                for j in range(start[n], end[n]):
+                    ex = r[i,0] - r[j,0]
+                    ey = r[i,1] - r[j,1]
+                    d2 = ex*ex + ey*ey + e2
+                    if d2 > 0.0:
+                        w = m[j]/(d2*np.sqrt(d2))
+                        ax -= w*ex
+                        ay -= w*ey
+            else:
+                for k in range(nchild[n]):
+                    stack[top] = child[n] + k
+                    top += 1
+        acc[s,0] = G*ax
+        acc[s,1] = G*ay
+    return acc
+
+#function: Barnes-Hut accelerations of every body in a built tree
+@Profiler.timed('tree.walk')
+def treeAccel(tree, theta, epsilon, groupSize=16, chunkSize=2**20, sinks=None):
+    #################################################
+    # each body walks the tree on its own, opening  #
+    # nodes by distance to the body rather than to  #
+    # a group box, so groupSize, chunkSize unused   #
+    #################################################
+    order2 = tree.expansionOrder == 2
+    quadrupole = tree.quadrupole if order2 else np.zeros((1, 3))
+    if sinks is None:
+        walk = np.arange(len(tree.m))
+    else:
+        #sorted positions of the sinks
+        rank = np.empty_like(tree.order)
+        rank[tree.order] = np.arange(len(rank))
+        walk = rank[np.asarray(sinks, dtype=int)]
+    acc = _treeWalk(tree.start, tree.end, tree.external, tree.child,
+                    tree.nchild, tree.com, tree.mass, tree.size,
+                    quadrupole, order2, tree.r, tree.m,
+                    float(theta), float(epsilon), walk)
+    if sinks is not None:
+        return acc
+    #return accelerations in original body order
+    out = np.empty_like(acc)
+    out[tree.order] = acc
+    return out
+
+#function: cloud in cell deposit onto periodic grid array
+@njit(cache=True)
+def _cicDeposit(array, x, masses):
+    nx, ny = array.shape
+    for p in range(x.shape[0]):
+        i = int(np.floor(x[p,0]))
+        j = int(np.floor(x[p,1]))
+        fx = x[p,0] - i
+        fy = x[p,1] - j
+        i0, i1 = i % nx, (i+1) % nx
+        j0, j1 = j % ny, (j+1) % ny
+        array[i0,j0] += masses[p]*(1.0-fx)*(1.0-fy)
+        array[i0,j1] += masses[p]*(1.0-fx)*fy
+        array[i1,j0] += masses[p]*fx*(1.0-fy)
+        array[i1,j1] += masses[p]*fx*fy
+
+#function: same as Grid.deposit, compiled for the cic kernel
+def deposit(grid, positions, masses, kernel=None):
+    kernel = grid.kernel if kernel is None else kernel
+    if kernel != 'cic':
+        grid.deposit(positions, masses, kernel)
+        return
+    with Profiler.phase('pm.deposit'):
+        x = (np.asarray(positions, dtype=float)-grid.r)/grid.D
+        array = np.array(grid.array, dtype=float)
+        _cicDeposit(array, x, np.ascontiguousarray(masses, dtype=float))
+        grid.array = array
+
+#function: second order central differences along both axes
+@njit(parallel=True, cache=True)
+def _grad2(f, h, periodic):
+    nx, ny = f.shape
+    ddx = np.zeros((nx, ny))
+    ddy = np.zeros((nx, ny))
+    for i in prange(nx):
+        for j in range(ny):
+            if periodic:
+                ddx[i,j] = (f[(i+1) % nx,j] - f[(i-1) % nx,j])/(2*h)
+                ddy[i,j] = (f[i,(j+1) % ny] - f[i,(j-1) % ny])/(2*h)
+                continue
+            #one sided differences on edges, as gradient.Deriv
+            if nx > 1:
+                if i == 0:
+                    ddx[i,j] = (f[1,j] - f[0,j])/h
+                elif i == nx-1:
+                    ddx[i,j] = (f[nx-1,j] - f[nx-2,j])/h
+                else:
+                    ddx[i,j] = (f[i+1,j] - f[i-1,j])/(2*h)
+            if ny > 1:
+                if j == 0:
+                    ddy[i,j] = (f[i,1] - f[i,0])/h
+                elif j == ny-1:
+                    ddy[i,j] = (f[i,ny-1] - f[i,ny-2])/h
+                else:
+                    ddy[i,j] = (f[i,j+1] - f[i,j-1])/(2*h)
+    return ddx, ddy
+
+#function: same as gradient.Grad, compiled for second order
+def gradient(image, h, order=2, boundary='onesided'):
+    if order != 2 or boundary not in ('onesided', 'periodic'):
+        return Grad(image, h, order, boundary)
+    image = np.ascontiguousarray(image, dtype=float)
+    return _grad2(image, float(h), boundary == 'periodic')
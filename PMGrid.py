@@ -9,16 +9,84 @@
 
 #essential imports
 import numpy as np
-from gradient import Grad
-import matplotlib.pyplot as plt
+from functools import lru_cache
+from gradient import SpectralGrad
+from Backends import getBackend
+import Profiler
+
+#mass assignment kernels: nearest grid point, cloud in cell,
+#triangular shaped cloud
+kernels = ('ngp', 'cic', 'tsc')
+#potential gradients: finite differences with one sided or periodic
+#edges, or ik multiplication in Fourier space
+gradients = ('onesided', 'periodic', 'spectral')
+
+#function: Fourier transform of inverse discrete Laplacian kernel
+@lru_cache(maxsize=16)
+def greens(shape, D, cols=None):
+    #frequencies of rfft2 output for grid of given shape, or only its
+    #columns cols[0]:cols[1] as held by one slab of SlabPM
+    M = shape[0]
+    j0, j1 = (0, shape[1]//2+1) if cols is None else cols
+    i = np.arange(shape[0])[:,None]
+    j = np.arange(j0, j1)[None,:]
+    #kernel value at each frequency, W**k + W**-k = 2cos(2 pi k/M)
+    denom = -(2*np.cos(2*np.pi*i/M)+2*np.cos(2*np.pi*j/M)-4)/D**2
+    #zero mode set to zero to not get NaNs from dividing by zero
+    green = np.zeros(denom.shape)
+    np.divide(1.0, denom, out=green, where=denom != 0)
+    if j0 == 0:
+        green[0][0] = 0.0
+    #shared between grids and time steps, so never modified
+    green.flags.writeable = False
+    return green
+
+#function: per axis assignment of positions in grid units to points
+def assignment(x, kernel):
+    #################################################
+    # x : (N,2) positions in grid spacings from the #
+    #     first point                               #
+    # returns lowest point index (N,2), offsets of  #
+    # the kernel's points from it, and per axis     #
+    # weights (N,2) for each offset                 #
+    #################################################
+    if kernel == 'ngp':
+        i = np.rint(x).astype(int)
+        offsets = [0]
+        w = [np.ones_like(x)]
+    elif kernel == 'cic':
+        i = np.floor(x).astype(int)
+        f = x - i
+        offsets = [0, 1]
+        w = [1.0 - f, f]
+    elif kernel == 'tsc':
+        i = np.rint(x).astype(int)
+        f = x - i
+        offsets = [-1, 0, 1]
+        w = [0.5*(0.5 - f)**2, 0.75 - f**2, 0.5*(0.5 + f)**2]
+    else:
+        raise ValueError("unknown kernel '"+str(kernel)+"', choose from "
+                         +", ".join(kernels))
+    return i, offsets, w
 
 #class: grid which can hold massive objects
 class Grid:
     """array of points as weighted grid"""
-    def __init__(self, array, rx, ry, D):
+    def __init__(self, array, rx, ry, D, kernel='ngp', gradient='onesided', order=2):
         self.array = array
         self.D = D #D is the length of grid spacings
         self.r = np.array([rx, ry])
+        if kernel not in kernels:
+            raise ValueError("unknown kernel '"+str(kernel)+"', choose from "
+                             +", ".join(kernels))
+        self.kernel = kernel
+        if gradient not in gradients:
+            raise ValueError("unknown gradient '"+str(gradient)+"', choose from "
+                             +", ".join(gradients))
+        if order not in (2, 4):
+            raise ValueError("order must be 2 or 4")
+        self.gradient = gradient
+        self.order = order #order of finite difference stencil
     def resetGrid(self):
         #resets grid to zeros
         self.array = np.zeros(self.array.shape)
@@ -27,30 +95,41 @@ class Grid:
         pos = np.rint((body.r-self.r)/self.D).astype(int)
         self.array[pos[0],pos[1]] += body.m
 
+    def stencil(self, positions, kernel=None):
+        #flat grid indices (N,k) and weights (N,k) of assignment kernel
+        kernel = self.kernel if kernel is None else kernel
+        x = (np.asarray(positions, dtype=float)-self.r)/self.D
+        i, offsets, w = assignment(x, kernel)
+        #combine per axis weights, wrapping indices periodically like the FFT
+        nx, ny = self.array.shape
+        idx, wts = [], []
+        for a, wa in zip(offsets, w):
+            for b, wb in zip(offsets, w):
+                idx.append(np.mod(i[:,0]+a, nx)*ny + np.mod(i[:,1]+b, ny))
+                wts.append(wa[:,0]*wb[:,1])
+        return np.stack(idx, axis=1), np.stack(wts, axis=1)
+    @Profiler.timed('pm.deposit')
+    def deposit(self, positions, masses, kernel=None):
+        #adds masses of all bodies onto the grid in one pass
+        idx, w = self.stencil(positions, kernel)
+        w = w*np.asarray(masses, dtype=float)[:,None]
+        mass = np.bincount(idx.ravel(), w.ravel(), minlength=self.array.size)
+        self.array = self.array + mass.reshape(self.array.shape)
+
     def evalForce(self):
         #density on grid points
         density = self.array/self.D**2
         #size of grid
         M = self.array.shape[0]
         
-        #Fourier exponential 
-        W = np.exp(2*np.pi*1j/M)
-
-        #Fourier transform of density
-        density_fft = (1.0/M)*np.fft.rfft2(density)
-        
-        #Fourier transform of kernel
-        denom = np.zeros(density_fft.shape).astype(complex)
-        for i in range(density_fft.shape[0]):
-            for j in range(density_fft.shape[1]):
-                #kernel value at each frequency
-                denom[i][j] = -(W**i+W**-i+W**j+W**-j-4)/self.D**2
+        with Profiler.phase('pm.fft'):
+            #Fourier transform of density
+            density_fft = (1.0/M)*np.fft.rfft2(density)
 
-        #Fourier transform of potential
-        potential_fft = density_fft/denom
-        potential_fft[0][0] = 0.0 + 0.0j #have to set this to not get NaNs from dividing by zero
-        #potential over grid
-        potential_grid = np.fft.irfft2(potential_fft)
+            #Fourier transform of potential, kernel computed once per grid
+            potential_fft = density_fft*greens(self.array.shape, self.D)
+            #potential over grid
+            potential_grid = np.fft.irfft2(potential_fft, s=self.array.shape)
 
         '''
         #Testing scheme to plot potential, ensuring Poisson equation was
@@ -62,17 +141,31 @@ class Grid:
         '''
 
         #force gradient of potential over grid
-        force_x, force_y = Grad(potential_grid, self.D)
+        with Profiler.phase('pm.gradient'):
+            if self.gradient == 'spectral':
+                #straight from Fourier space, skipping real space stencil
+                force_x, force_y = SpectralGrad(potential_fft, self.array.shape, self.D)
+            else:
+                grad = getBackend().gradient
+                force_x, force_y = grad(potential_grid, self.D, self.order, self.gradient)
         force_grid = np.transpose(np.array([force_x,force_y]), (1,2,0))
-        #update forces on grid points
+        #update forces on grid points, forces are gradient of potential
         self.forces = force_grid
+        self.potential = potential_grid
     def forceOn(self, body):
         #round positions on grid to nearest int
         pos = np.rint((body.r-self.r)/self.D).astype(int)
         return self.forces[pos[0],pos[1]]
+    @Profiler.timed('pm.interpolate')
+    def interpolate(self, positions, kernel=None):
+        #grid forces at all bodies (N,2), same kernel as deposit
+        idx, w = self.stencil(positions, kernel)
+        forces = self.forces.reshape(-1, 2)[idx]
+        return (forces*w[...,None]).sum(axis=1)
 
     def plot(self, u):
         #plot grid, and number of masses in each grid
+        import matplotlib.pyplot as plt
         num = (self.array/u).astype(int)
         for i in range(num.shape[0]):
             for j in range(num.shape[1]):
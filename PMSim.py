@@ -9,76 +9,95 @@
 #################################################################
 
 #essential modules
+import argparse
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 #essential imports
-from MCgalaxy import generateGalaxy
+from MCgalaxy import galaxyParticles
 from PMGrid import Grid
+from AMRGrid import AMRGrid
+from Integrator import leapFrog
+from Backends import getBackend
+from Snapshot import SnapshotWriter, movie
+import Checkpoint
 
-#Constants: Milky Way parameters
-r0 = 3 #kpc, scale length of galaxy
-m0 = 50.0 #10^9 solar masses, mass of galaxy
-#generate 1000 masses in 15kpc box
-N = 1000 #number of bodies
-L = 15.0 #kpc box radius
+#function: main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="particle mesh galaxy simulation")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue from the last checkpoint")
+    parser.add_argument('--refine', type=int, default=0, metavar='LEVELS',
+                        help="levels of mesh refinement patches, 0 for none")
+    args = parser.parse_args()
 
-#create bodies data
-bodies = generateGalaxy(r0, m0, N, L)
+    #Constants: Milky Way parameters
+    r0 = 3 #kpc, scale length of galaxy
+    m0 = 50.0 #10^9 solar masses, mass of galaxy
+    #generate 1000 masses in 15kpc box
+    N = 1000 #number of bodies
+    L = 15.0 #kpc box radius
 
-#grid resolution and initializing grid
-D = L/np.sqrt(N) #kpc grid spacing, based on number of bodies in our grid
-init = np.zeros([np.ceil(2*L/D).astype(int)+2,np.ceil(2*L/D).astype(int)+2])
-rho = Grid(init, -L, -L, D)
+    #grid resolution and initializing grid
+    D = L/np.sqrt(N) #kpc grid spacing, based on number of bodies in our grid
+    init = np.zeros([np.ceil(2*L/D).astype(int)+2,np.ceil(2*L/D).astype(int)+2])
+    if args.refine:
+        #nested patches where points hold more than two bodies' mass
+        rho = AMRGrid(init, -L, -L, D, kernel='cic', levels=args.refine)
+    else:
+        rho = Grid(init, -L, -L, D, kernel='cic')
+    #force kernels, 'numpy' or 'numba', also set by NBODY_BACKEND
+    backend = getBackend()
 
-#time stepping variables for animation
-dt = 0.1 #Myr
-T = 200.0 #Myr
-steps = int(T/dt)
+    #time stepping variables for animation
+    dt = 0.1 #Myr
+    T = 200.0 #Myr
+    steps = int(T/dt)
+    #steps between checkpoints
+    checkpointEvery = 100
+    checkpoint = 'ParticleMesh-Nbody'+str(N)+'.npz'
 
-#make list of objects for plotting
-images = []
-#plotting setup
-fig = plt.figure()
-ax = plt.axes(xlim=(-L, L), ylim=(-L, L))
+    #function: force on every body from the density grid
+    def computeForce(particles):
+        #reset density grid
+        rho.resetGrid()
+        #assign density to grid points from all bodies, patches are
+        #placed from the bodies a refined grid deposits itself
+        if args.refine:
+            rho.deposit(particles.r, particles.m)
+        else:
+            backend.deposit(rho, particles.r, particles.m)
+        #evaluate force on grid
+        rho.evalForce()
+        #apply force to each particle
+        particles.f[:] = rho.interpolate(particles.r)
 
-#assign density to grid points by inserting bodies
-for body in bodies:
-    rho.insertBody(body)
-#evaluate force on grid in particle system
-rho.evalForce()
-#apply force to each particle in leapfrog step
-for body in bodies:
-    force = rho.forceOn(body)
-    body.resetForce(force[0], force[1])
-    #evolve each body in time half step
-    body.leapFrog(dt)
-        
-#evolve particle system in time
-for i in range(steps):
-    #counter
-    print "Time step "+str(i+1)+"/"+str(steps)
-    #reset density grid
-    rho.resetGrid()
-    #assign density to grid points by inserting bodies
-    for body in bodies:
-        rho.insertBody(body)
-    #evaluate force on grid
-    rho.evalForce()
-    #apply force to each particle
-    for body in bodies:
-        force = rho.forceOn(body)
-        body.resetForce(force[0], force[1])
-        #evolve each body in time
-        body.update(dt)
-        
-    #append to list of objects for plotting
-    position = np.array([body.r for body in bodies]).T
-    scatter, = ax.plot(position[0], position[1], 'k.')
-    images.append((scatter,))
+    #stream every 10th frame to disk instead of keeping them for plotting
+    path = 'ParticleMesh-Nbody'+str(N)+'.nbs'
+    if args.resume:
+        #bodies and forces as checkpointed, the grid keeps no state
+        particles, start, t, states = Checkpoint.load(checkpoint)
+        snaps = SnapshotWriter(path, every=10, append=True, lastStep=start)
+    else:
+        #create bodies data
+        particles = galaxyParticles(r0, m0, N, L)
+        computeForce(particles)
+        start = 0
+        snaps = SnapshotWriter(path, every=10, meta={'N': len(particles), 'L': L,
+                                                     'dt': dt, 'solver': 'pm'})
+        snaps.write(particles, 0, 0.0)
 
-#animate plot, interval gives frames per milisecond
-anim = animation.ArtistAnimation(fig, images, interval=100, blit=True)
-anim.save('ParticleMesh-Nbody'+str(N)+'.mp4')
-plt.show()
+    #evolve particle system in time
+    for i in range(start, steps):
+        #counter
+        print("Time step "+str(i+1)+"/"+str(steps))
+        #evolve every body by a kick-drift-kick leapfrog step
+        leapFrog(particles, dt, computeForce)
+
+        #append frame to snapshot file when due
+        snaps.write(particles, i+1, (i+1)*dt)
+        if (i+1) % checkpointEvery == 0:
+            Checkpoint.save(checkpoint, particles, i+1, (i+1)*dt)
+    snaps.close()
+
+    #animate snapshots, interval gives milliseconds per frame
+    movie(path, 'ParticleMesh-Nbody'+str(N)+'.mp4', L, interval=100)
@@ -9,13 +9,15 @@
 #################################################################
 
 #essential modules
-import time
+from time import perf_counter as clock
 import numpy as np
 import matplotlib.pyplot as plt
 
 #essential imports
 from PMGrid import Grid
 from MCgalaxy import generateGalaxy
+from Particles import ParticleSet
+from Diagnostics import Diagnostics, meshEnergy
 
 #function: main
 if __name__ == '__main__':
@@ -23,6 +25,8 @@ if __name__ == '__main__':
     # Computational Complexity Test #
     #################################
     
+    #same galaxies on every run, so timings compare between runs
+    np.random.seed(0)
     #Constants: Milky Way parameters
     r0 = 3 #kiloparsecs, scale length of galaxy
     m0 = 50.0 #10^9 solar masses, mass of galaxy
@@ -45,13 +49,13 @@ if __name__ == '__main__':
     
     #list of N for which to test runtime
     elapsed_list = []
-    N_list = range(1, 101)+range(101,1001,10)+range(1001,10001,100)
+    N_list = np.array(list(range(1, 101))+list(range(101,1001,10))+list(range(1001,10001,100)))
     #calculating time to evaluate mesh for each N
     for i in N_list:
         #generate bodies
         i_bodies = generateGalaxy(r0, m0, i, L)
         #start counter
-        start = time.clock()
+        start = clock()
         #add bodies to grid
         for i_body in i_bodies:
             rho.insertBody(i_body)
@@ -63,9 +67,9 @@ if __name__ == '__main__':
             i_body.resetForce(force[0], force[1])
             #evolve each body in time
             i_body.update(dt)
-        elapsed = (time.clock() - start)
+        elapsed = (clock() - start)
         elapsed_list.append(elapsed)
-        print "N step "+str(i)+"/10000"
+        print("N step "+str(i)+"/10000")
     #plot runtime
     plt.plot(N_list, elapsed_list,label= 'PM Runtime')
     #NlogN time
@@ -118,22 +122,19 @@ if __name__ == '__main__':
         #evolve each body in time half step
         body.leapFrog(dt)
         
-    #track energy at each time step.
-    t = np.linspace(0,steps*dt,steps)
-    E = np.zeros(len(t))
-    #sum kinetic
-    for body in bodies:
-        E[0]+=body.Kenergy(dt)
-    #sum potential
-    for j in range(len(bodies)):
-        for k in range(j+1,len(bodies)):
-            E[0]+=bodies[j].Uinteract(bodies[k])
+    #track energy at each time step, potential from the mesh
+    #potential of the last force evaluation, O(N)
+    diag = Diagnostics(lambda particles: meshEnergy(rho, particles.r), every=1)
+    def snapshot():
+        #velocities at position time, half a kick from leapfrog ones
+        return ParticleSet([body.m for body in bodies], [body.r for body in bodies],
+                           [body.vHalfStep(dt) for body in bodies])
+    diag(snapshot(), 0, 0.0)
 
     #evolve particle system in time
-    #WARNING, slow because O(N^2) calculation
     for i in range(steps):
         #counter
-        print "Time step "+str(i+1)+"/"+str(steps)
+        print("Time step "+str(i+1)+"/"+str(steps))
         #evaluate force on grid in particle system
         rho.evalForce()
         #apply force to each particle
@@ -142,15 +143,11 @@ if __name__ == '__main__':
             body.resetForce(force[0], force[1])
             #evolve each body in time
             body.update(dt)
-        #calculate energy at each time step
-        for body in bodies:
-            E[i]+=body.Kenergy(dt)
-        for j in range(len(bodies)):
-            for k in range(j+1,len(bodies)):
-                E[i]+=bodies[j].Uinteract(bodies[k])
+        #record energy at each time step
+        diag(snapshot(), i+1, (i+1)*dt)
 
     #Energy plot
-    plt.plot(t, E)
+    plt.plot(diag.column('t'), diag.column('E'))
     plt.title("Energy conservation")
     plt.ylabel("Energy"+r'[$M\odot kpc^2/(10Myr)^2$]')
     plt.show()
@@ -0,0 +1,170 @@
+#################################################################
+# Name:     Parallel.py                                         #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program evaluates Barnes-Hut and direct summation   #
+#           forces with a pool of worker processes sharing the  #
+#           tree and body arrays through shared memory.         #
+#################################################################
+
+#essential modules
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+from types import SimpleNamespace
+
+#essential imports
+from TreeWalk import sinkGroups, activeGroups, walkAccel
+from DirectSum import directAccel
+import Profiler
+
+#tree arrays used by the walk
+_treeFields = ('start', 'end', 'external', 'nchild', 'child',
+               'com', 'mass', 'size', 'r', 'm')
+
+#function: open existing shared memory block without tracking it
+def _open(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        #before python 3.13 attaching registers the block again with
+        #the resource tracker shared with the parent, which is harmless
+        return shared_memory.SharedMemory(name=name)
+
+#shared memory blocks attached in this worker process, by name
+_attached = {}
+
+#function: array view of shared memory block described by spec
+def _view(spec):
+    name, shape, dtype = spec
+    if name not in _attached:
+        _attached[name] = _open(name)
+    return np.ndarray(shape, dtype=dtype, buffer=_attached[name].buf)
+
+#function: detach blocks no longer in use, which the parent replaced
+def _release(specs):
+    names = set(spec[0] for spec in specs.values())
+    for name in list(_attached):
+        if name not in names:
+            _attached.pop(name).close()
+
+#function: worker task, tree walk for a run of sink groups
+def _treeTask(args):
+    specs, expansionOrder, theta, epsilon, chunkSize, split, cutoff, a, b = args
+    _release(specs)
+    tree = SimpleNamespace(expansionOrder=expansionOrder)
+    for key in _treeFields + ('quadrupole',):
+        if key in specs:
+            setattr(tree, key, _view(specs[key]))
+    groups = _view(specs['groups'])[a:b]
+    #each worker writes only the rows of its own groups
+    walkAccel(tree, theta, epsilon, groups, chunkSize, out=_view(specs['acc']),
+              split=split, cutoff=cutoff)
+
+#function: worker task, direct summation for a run of sinks
+def _directTask(args):
+    specs, epsilon, tile, a, b = args
+    _release(specs)
+    r, m = _view(specs['r']), _view(specs['m'])
+    _view(specs['acc'])[a:b] = directAccel(r, m, epsilon, tile, np.arange(a, b))
+
+#class: named shared memory blocks reused between calls
+class SharedArrays:
+    """shared memory blocks holding arrays for worker processes"""
+    def __init__(self):
+        self.blocks = {}
+    def empty(self, key, shape, dtype=float):
+        #view of shared block for array, replaced only when too small
+        dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(shape))*dtype.itemsize, 1)
+        shm = self.blocks.get(key)
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            #some headroom so slowly growing trees do not reallocate
+            shm = shared_memory.SharedMemory(create=True, size=int(nbytes*1.25))
+            self.blocks[key] = shm
+        a = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        return a, (shm.name, tuple(shape), dtype.str)
+    def put(self, key, array):
+        #copy array into shared block
+        array = np.ascontiguousarray(array)
+        a, spec = self.empty(key, array.shape, array.dtype)
+        a[...] = array
+        return spec
+    def close(self):
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks = {}
+
+#function: split weighted items into contiguous runs of similar weight
+def partition(weights, parts):
+    cum = np.cumsum(weights)
+    if len(cum) == 0:
+        return []
+    cuts = np.searchsorted(cum, cum[-1]*np.arange(1, parts)/parts)
+    bounds = np.unique(np.concatenate([[0], cuts, [len(cum)]]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+#class: process pool evaluating forces in parallel
+class ParallelForce:
+    """pool of workers evaluating forces on shared arrays"""
+    def __init__(self, workers=None, tasksPerWorker=4):
+        self.workers = workers if workers else mp.cpu_count()
+        #more tasks than workers evens out uneven interaction counts
+        self.tasks = self.workers*tasksPerWorker
+        #workers must share the parent's resource tracker, else each
+        #starts its own and unlinks blocks it attached to on exit
+        resource_tracker.ensure_running()
+        self.pool = mp.get_context().Pool(self.workers)
+        self.shared = SharedArrays()
+
+    @Profiler.timed('tree.walk')
+    def treeAccel(self, tree, theta, epsilon, groupSize=16, chunkSize=2**20,
+                  split=None, cutoff=np.inf, sinks=None):
+        #same result as TreeWalk.treeAccel, bit for bit, for any workers,
+        #split must be picklable, such as a functools.partial
+        specs = {}
+        for key in _treeFields:
+            specs[key] = self.shared.put(key, getattr(tree, key))
+        if tree.expansionOrder == 2:
+            specs['quadrupole'] = self.shared.put('quadrupole', tree.quadrupole)
+        groups = sinkGroups(tree, groupSize)
+        if sinks is not None:
+            groups, pos = activeGroups(tree, groups, sinks)
+        specs['groups'] = self.shared.put('groups', groups)
+        acc, specs['acc'] = self.shared.empty('acc', (len(tree.m), 2))
+        acc[...] = 0.0
+        #Morton ordered groups give spatially coherent runs of sinks
+        runs = partition(tree.end[groups] - tree.start[groups], self.tasks)
+        self.pool.map(_treeTask, [(specs, tree.expansionOrder, theta, epsilon,
+                                   chunkSize, split, cutoff, a, b)
+                                  for a, b in runs])
+        if sinks is not None:
+            return acc[pos]
+        #return accelerations in original body order
+        out = np.empty((len(tree.m), 2))
+        out[tree.order] = acc
+        return out
+
+    @Profiler.timed('direct')
+    def directAccel(self, r, m, epsilon, tile=1024):
+        #same result as DirectSum.directAccel for any number of workers
+        specs = {'r': self.shared.put('r', np.asarray(r, dtype=float)),
+                 'm': self.shared.put('m', np.asarray(m, dtype=float))}
+        acc, specs['acc'] = self.shared.empty('acc', (len(m), 2))
+        runs = partition(np.ones(len(m)), self.tasks)
+        self.pool.map(_directTask, [(specs, epsilon, tile, a, b) for a, b in runs])
+        return acc.copy()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.shared.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,74 @@
+#################################################################
+# Name:     Particles.py                                        #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program is object definition for a set of massive   #
+#           bodies stored as contiguous arrays for N-body       #
+#           simulation.                                         #
+#################################################################
+
+#essential modules
+import numpy as np
+
+#essential imports
+from Body import Body
+
+#class: structure-of-arrays store of massive objects
+class ParticleSet:
+    """masses, positions, velocities and forces of N bodies"""
+    def __init__(self, m, r, v=None, f=None, L=0, color='k'):
+        #masses (N,), positions, velocities and forces (N,2)
+        self.r = np.array(r, dtype=float).reshape(-1, 2)
+        N = len(self.r)
+        self.m = np.array(np.broadcast_to(m, (N,)), dtype=float)
+        if v is None:
+            self.v = np.zeros((N, 2))
+        else:
+            self.v = np.array(v, dtype=float).reshape(N, 2)
+        if f is None:
+            self.f = np.zeros((N, 2))
+        else:
+            self.f = np.array(f, dtype=float).reshape(N, 2)
+        #half length of periodic box
+        self.L = L
+        self.c = color
+
+    @classmethod
+    def empty(cls, N, L=0, color='k'):
+        #allocate N massless bodies at rest at the origin
+        return cls(np.zeros(N), np.zeros((N, 2)), L=L, color=color)
+
+    @classmethod
+    def fromBodies(cls, bodies):
+        #gather a list of Body objects into contiguous arrays
+        m = [body.m for body in bodies]
+        r = [body.r for body in bodies]
+        v = [body.v for body in bodies]
+        f = [body.f for body in bodies]
+        L = bodies[0].L if len(bodies) > 0 else 0
+        c = bodies[0].c if len(bodies) > 0 else 'k'
+        return cls(m, r, v, f, L=L, color=c)
+
+    def __len__(self):
+        return len(self.m)
+    def __getitem__(self, i):
+        #Body view of a single particle
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("particle index out of range")
+        return Body.view(self, i)
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Body.view(self, i)
+    def bodies(self):
+        #list of Body views for code written against Body lists
+        return list(self)
+
+    def resetForce(self):
+        #reset all forces to zero
+        self.f[:] = 0.0
+    def accel(self):
+        #acceleration of every body
+        return self.f/self.m[...,None]
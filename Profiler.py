@@ -0,0 +1,128 @@
+#################################################################
+# Name:     Profiler.py                                         #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program accumulates time spent in each phase of an  #
+#           N-body step and counts of interactions, at almost   #
+#           no cost while disabled, for per-step profiling.     #
+#################################################################
+
+#essential modules
+import os
+import json
+import functools
+from time import perf_counter
+from contextlib import nullcontext
+from collections import defaultdict
+
+#################################################################
+# Phases are named like 'tree.build', 'pm.fft' or 'io.snapshot' #
+# and nest, so the time of a phase includes phases inside it.   #
+# Work done in worker processes of a pool is timed as a whole   #
+# by the parent, its counts are not collected.                  #
+#################################################################
+
+#profiling switch, read by instrumented code before counting
+enabled = False
+#seconds and calls per phase, and counters, since last record()
+times = defaultdict(float)
+calls = defaultdict(int)
+counts = defaultdict(int)
+
+#shared do-nothing phase while disabled
+_off = nullcontext()
+
+#class: timer of one entry into a phase
+class _Phase:
+    __slots__ = ('name', 't')
+    def __init__(self, name):
+        self.name = name
+    def __enter__(self):
+        self.t = perf_counter()
+    def __exit__(self, *exc):
+        times[self.name] += perf_counter() - self.t
+        calls[self.name] += 1
+
+#function: context timing a block as phase name
+def phase(name):
+    if not enabled:
+        return _off
+    return _Phase(name)
+
+#function: decorator timing every call of a function as phase name
+def timed(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def timedFunc(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            t = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                times[name] += perf_counter() - t
+                calls[name] += 1
+        return timedFunc
+    return decorate
+
+#function: add n to counter name
+def count(name, n=1):
+    if enabled:
+        counts[name] += int(n)
+
+#function: switch profiling on or off, discarding what was gathered
+def enable(on=True):
+    global enabled
+    enabled = on
+    reset()
+def disable():
+    enable(False)
+
+#function: discard gathered times and counts
+def reset():
+    times.clear()
+    calls.clear()
+    counts.clear()
+
+#function: JSON ready record of times and counts, then reset
+def record():
+    rec = {'times': dict(times), 'calls': dict(calls), 'counts': dict(counts)}
+    reset()
+    return rec
+
+#function: readable table of a record, slowest phase first
+def report(rec):
+    lines = []
+    for name, t in sorted(rec['times'].items(), key=lambda x: -x[1]):
+        lines.append("%-16s %10.6f s %8d calls" % (name, t, rec['calls'].get(name, 0)))
+    for name, n in sorted(rec['counts'].items()):
+        lines.append("%-16s %12d" % (name, n))
+    return "\n".join(lines)
+
+#function: JSON lines file of step records reopened to append
+def openRecords(path, lastStep=None):
+    #################################################
+    # lastStep : drop records after this step, such #
+    #            as those written after the         #
+    #            checkpoint resumed from, None to   #
+    #            keep all                           #
+    # returns the open file and the records kept    #
+    #################################################
+    kept = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    #last line cut short when the run was killed
+                    break
+                if lastStep is None or rec['step'] <= lastStep:
+                    kept.append(rec)
+        #rewritten whole beside the old file, so a crash keeps one of them
+        with open(path+'.tmp', 'w') as f:
+            for rec in kept:
+                f.write(json.dumps(rec)+"\n")
+        os.replace(path+'.tmp', path)
+    return open(path, 'a'), kept
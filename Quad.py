@@ -9,7 +9,6 @@
 
 #essential modules
 import numpy as np
-import matplotlib.pyplot as plt
 
 #class: a quadrant in space
 class Quad:
@@ -35,7 +34,8 @@ class Quad:
         return Quad(self.r[0]+self.L/2.0, self.r[1]+self.L/2.0, self.L/2.0)
 
     def plot(self):
-        #plot quadrant
+        #plot quadrant, plotting only needed here so imported here
+        import matplotlib.pyplot as plt
         rx, ry, L = self.r[0], self.r[1], self.L
         plt.plot([rx, rx+L], [ry, ry], c='b')
         plt.plot([rx, rx], [ry, ry+L], c='b')
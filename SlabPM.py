@@ -0,0 +1,485 @@
+#################################################################
+# Name:     SlabPM.py                                           #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program solves the particle mesh of PMGrid.Grid     #
+#           split into slabs of rows across worker processes,   #
+#           with a transpose based parallel FFT and ghost rows  #
+#           exchanged between neighbouring slabs.               #
+#                                                               #
+#   python SlabPM.py --workers 4 --N 100000 --T 1 --out s.npz   #
+#################################################################
+
+#essential modules
+import argparse
+import operator
+import queue
+import time
+import traceback
+import numpy as np
+import multiprocessing as mp
+from functools import reduce
+
+#essential imports
+from PMGrid import Grid, kernels, gradients, greens, assignment
+from gradient import Deriv
+from MCgalaxy import galaxyParticles
+from Integrator import getIntegrator
+import Profiler
+
+#################################################################
+# Every rank runs the same program on its own slab, as under    #
+# MPI. Ranks talk through a communicator whose methods are      #
+# named and called as the lowercase, pickling methods of an     #
+# mpi4py communicator: send, recv, sendrecv, alltoall,          #
+# allgather, allreduce, bcast, scatter, gather and barrier,     #
+# with rank and size attributes, and tags below tagBase.        #
+# PipeComm implements them with one multiprocessing queue per   #
+# rank, and launch starts the ranks as local processes. Under   #
+# MPI, where tags must lie in 0..MPI_TAG_UB, the functions are  #
+# called once per rank with MPI.COMM_WORLD instead.             #
+#                                                               #
+# Rank k holds rows rows[k]:rows[k+1] of the (nx,ny) mesh. The  #
+# rfft2 of Grid.evalForce is done as rfft along y on own rows,  #
+# an all to all transpose so rank k holds columns               #
+# cols[k]:cols[k+1] of every row, then fft along x. The inverse #
+# runs the same steps backwards. Bodies live on the rank owning #
+# the row below them, so their stencils reach at most ghost     #
+# rows past the slab: masses deposited there are sent to the    #
+# neighbouring slab and added, and the neighbours' potential    #
+# and forces are copied there before differencing and           #
+# interpolating. Rows wrap periodically as in Grid.             #
+#################################################################
+
+#message tags of collectives and ghost exchange, above those left to
+#callers, 0 to 31999, and within the 32767 every MPI allows
+tagBase = 32000
+_ALLTOALL, _BCAST, _UP, _DOWN = range(tagBase, tagBase + 4)
+#rows past each edge of a slab reached by any kernel or stencil
+_ghost = 2
+
+#class: communicator of one local rank
+class PipeComm:
+    """mpi4py style communicator over multiprocessing queues"""
+    def __init__(self, rank, size, inboxes):
+        #################################################
+        # inboxes : one queue per rank, messages are    #
+        #           put as (source, tag, object)        #
+        #################################################
+        self.rank = rank
+        self.size = size
+        self.inboxes = inboxes
+        #messages received before their matching recv, by (source, tag)
+        self._early = {}
+
+    def Get_rank(self):
+        return self.rank
+    def Get_size(self):
+        return self.size
+
+    def send(self, obj, dest, tag=0):
+        #queues buffer every message, so send never blocks
+        self.inboxes[dest].put((self.rank, tag, obj))
+    def recv(self, source, tag=0):
+        #messages of one source arrive in the order they were sent
+        early = self._early.get((source, tag))
+        if early:
+            return early.pop(0)
+        while True:
+            src, t, obj = self.inboxes[self.rank].get()
+            if src == source and t == tag:
+                return obj
+            self._early.setdefault((src, t), []).append(obj)
+    def sendrecv(self, sendobj, dest, sendtag=0, source=None, recvtag=None):
+        #send to dest and receive from source, by default dest
+        self.send(sendobj, dest, sendtag)
+        return self.recv(dest if source is None else source,
+                         sendtag if recvtag is None else recvtag)
+
+    def alltoall(self, sendobj):
+        #item k of sendobj to rank k, list of items from every rank
+        for k in range(1, self.size):
+            dest = (self.rank + k) % self.size
+            self.send(sendobj[dest], dest, _ALLTOALL)
+        recvobj = [None]*self.size
+        recvobj[self.rank] = sendobj[self.rank]
+        for k in range(1, self.size):
+            source = (self.rank - k) % self.size
+            recvobj[source] = self.recv(source, _ALLTOALL)
+        return recvobj
+    def allgather(self, sendobj):
+        return self.alltoall([sendobj]*self.size)
+    def allreduce(self, sendobj, op=operator.add):
+        #reduced in rank order, so every rank gets the same bits
+        return reduce(op, self.allgather(sendobj))
+    def bcast(self, obj, root=0):
+        if self.rank == root:
+            for dest in range(self.size):
+                if dest != root:
+                    self.send(obj, dest, _BCAST)
+            return obj
+        return self.recv(root, _BCAST)
+    def scatter(self, sendobj, root=0):
+        #item k of root's sendobj to rank k
+        if self.rank == root:
+            for dest in range(self.size):
+                if dest != root:
+                    self.send(sendobj[dest], dest, _BCAST)
+            return sendobj[root]
+        return self.recv(root, _BCAST)
+    def gather(self, sendobj, root=0):
+        #list of every rank's item at root, None elsewhere
+        recvobj = self.alltoall([sendobj if k == root else None
+                                 for k in range(self.size)])
+        return recvobj if self.rank == root else None
+    def barrier(self):
+        self.allgather(None)
+
+#function: body of a rank process, reporting its result or failure
+def _rankMain(rank, size, inboxes, results, func, args):
+    try:
+        results.put((rank, True, func(PipeComm(rank, size, inboxes), *args)))
+    except Exception:
+        results.put((rank, False, traceback.format_exc()))
+
+#function: run func on local ranks, results in rank order
+def launch(func, size, *args):
+    #################################################
+    # calls func(comm, *args) in size processes,    #
+    # func and args must be picklable. A failing    #
+    # rank stops every rank and raises here         #
+    #################################################
+    ctx = mp.get_context()
+    inboxes = [ctx.Queue() for _ in range(size)]
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_rankMain, args=(rank, size, inboxes, results, func, args))
+             for rank in range(size)]
+    for p in procs:
+        p.start()
+    out = [None]*size
+    done = 0
+    try:
+        while done < size:
+            try:
+                rank, ok, value = results.get(timeout=1.0)
+            except queue.Empty:
+                #a rank killed outright never reports
+                dead = [k for k, p in enumerate(procs) if p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError("rank "+str(dead[0])+" exited with code "
+                                       +str(procs[dead[0]].exitcode))
+                continue
+            if not ok:
+                raise RuntimeError("rank "+str(rank)+" failed:\n"+value)
+            out[rank] = value
+            done += 1
+    finally:
+        if done < size:
+            for p in procs:
+                p.terminate()
+        for p in procs:
+            p.join()
+    return out
+
+#function: bounds of n items split into parts contiguous runs
+def slabs(n, parts):
+    return n*np.arange(parts + 1)//parts
+
+#class: slab of rows of a particle mesh held by one rank
+class SlabGrid:
+    """rows of a PMGrid.Grid of given shape, solved with the other ranks"""
+    def __init__(self, comm, shape, rx, ry, D, kernel='cic', gradient='onesided', order=2):
+        #################################################
+        # comm : communicator, every rank of it holds   #
+        #        one slab                               #
+        # shape : (nx,ny) points of the whole mesh,     #
+        #         other arguments as Grid               #
+        #################################################
+        if kernel not in kernels:
+            raise ValueError("unknown kernel '"+str(kernel)+"', choose from "
+                             +", ".join(kernels))
+        if gradient not in gradients:
+            raise ValueError("unknown gradient '"+str(gradient)+"', choose from "
+                             +", ".join(gradients))
+        if order not in (2, 4):
+            raise ValueError("order must be 2 or 4")
+        self.comm = comm
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.r = np.array([rx, ry])
+        self.D = D
+        self.kernel = kernel
+        self.gradient = gradient
+        self.order = order
+        #rows of real space slabs, columns of y transforms, per rank
+        self.rows = slabs(self.shape[0], comm.size)
+        self.cols = slabs(self.shape[1]//2 + 1, comm.size)
+        if np.diff(self.rows).min() < _ghost:
+            raise ValueError("slabs need at least "+str(_ghost)+" rows, "
+                             "use fewer ranks or more points")
+        self.x0, self.x1 = self.rows[comm.rank], self.rows[comm.rank + 1]
+        self.array = np.zeros((self.x1 - self.x0, self.shape[1]))
+
+    def resetGrid(self):
+        self.array = np.zeros(self.array.shape)
+
+    def owner(self, positions):
+        #rank holding the row below each body, wrapped periodically
+        x = (np.asarray(positions, dtype=float)[:,0] - self.r[0])/self.D
+        row = np.mod(np.floor(x).astype(int), self.shape[0])
+        return np.searchsorted(self.rows, row, side='right') - 1
+
+    def stencil(self, positions, kernel=None):
+        #flat indices (N,k) into the slab with ghost rows, and weights
+        kernel = self.kernel if kernel is None else kernel
+        x = (np.asarray(positions, dtype=float) - self.r)/self.D
+        i, offsets, w = assignment(x, kernel)
+        nx, ny = self.shape
+        #rows from the first ghost row, unwrapped alike for the points
+        #of one body as the row below it fixes its slab
+        base = np.floor(x[:,0]).astype(int)
+        row = i[:,0] - (base - np.mod(base, nx)) - self.x0 + _ghost
+        if len(row) and (row.min() + offsets[0] < 0 or
+                         row.max() + offsets[-1] >= len(self.array) + 2*_ghost):
+            raise ValueError("bodies outside slab, migrate them first")
+        idx, wts = [], []
+        for a, wa in zip(offsets, w):
+            for b, wb in zip(offsets, w):
+                idx.append((row + a)*ny + np.mod(i[:,1] + b, ny))
+                wts.append(wa[:,0]*wb[:,1])
+        return np.stack(idx, axis=1), np.stack(wts, axis=1)
+
+    def exchange(self, lower, upper):
+        #################################################
+        # sends lower rows to the rank below and upper  #
+        # rows to the rank above, periodically, returns #
+        # the rows received from below and from above   #
+        #################################################
+        comm = self.comm
+        below = (comm.rank - 1) % comm.size
+        above = (comm.rank + 1) % comm.size
+        fromBelow = comm.sendrecv(upper, dest=above, sendtag=_UP, source=below, recvtag=_UP)
+        fromAbove = comm.sendrecv(lower, dest=below, sendtag=_DOWN, source=above, recvtag=_DOWN)
+        return fromBelow, fromAbove
+
+    @Profiler.timed('pm.deposit')
+    def deposit(self, positions, masses, kernel=None):
+        #masses of this rank's bodies, those on ghost rows sent to their slab
+        g = _ghost
+        idx, w = self.stencil(positions, kernel)
+        w = w*np.asarray(masses, dtype=float)[:,None]
+        shape = (len(self.array) + 2*g, self.shape[1])
+        mass = np.bincount(idx.ravel(), w.ravel(), minlength=shape[0]*shape[1])
+        mass = mass.reshape(shape)
+        fromBelow, fromAbove = self.exchange(mass[:g], mass[-g:])
+        mass = mass[g:-g]
+        mass[:g] += fromBelow
+        mass[-g:] += fromAbove
+        self.array = self.array + mass
+
+    def _transpose(self, a):
+        #(..., own rows, all columns) to (..., all rows, own columns)
+        parts = [a[...,self.cols[k]:self.cols[k+1]] for k in range(self.comm.size)]
+        return np.concatenate(self.comm.alltoall(parts), axis=-2)
+    def _untranspose(self, a):
+        #(..., all rows, own columns) to (..., own rows, all columns)
+        parts = [a[...,self.rows[k]:self.rows[k+1],:] for k in range(self.comm.size)]
+        return np.concatenate(self.comm.alltoall(parts), axis=-1)
+
+    def evalForce(self):
+        #as Grid.evalForce, each rank transforming its rows then columns
+        nx, ny = self.shape
+        k0, k1 = self.cols[self.comm.rank], self.cols[self.comm.rank + 1]
+        density = self.array/self.D**2
+        with Profiler.phase('pm.fft'):
+            density_fft = np.fft.rfft(density, axis=1)
+            with Profiler.phase('pm.transpose'):
+                density_fft = self._transpose(density_fft)
+            density_fft = (1.0/nx)*np.fft.fft(density_fft, axis=0)
+            #own columns only, so no rank holds the whole kernel
+            potential_fft = density_fft*greens(self.shape, self.D, (int(k0), int(k1)))
+            if self.gradient == 'spectral':
+                #ik multiplication as SpectralGrad, Nyquist modes zeroed
+                kx = 2*np.pi*np.fft.fftfreq(nx, self.D)[:,None]
+                ky = 2*np.pi*np.fft.rfftfreq(ny, self.D)
+                if nx % 2 == 0:
+                    kx[nx//2] = 0.0
+                if ny % 2 == 0:
+                    ky[-1] = 0.0
+                ky = ky[None,k0:k1]
+                spectra = np.stack([potential_fft, 1j*kx*potential_fft,
+                                    1j*ky*potential_fft])
+            else:
+                spectra = potential_fft[None]
+            spectra = np.fft.ifft(spectra, axis=-2)
+            with Profiler.phase('pm.transpose'):
+                spectra = self._untranspose(spectra)
+            fields = np.fft.irfft(spectra, n=ny, axis=-1)
+        potential = fields[0]
+        g = _ghost
+        with Profiler.phase('pm.gradient'):
+            if self.gradient == 'spectral':
+                force_x, force_y = fields[1], fields[2]
+            else:
+                #x differences on the slab with neighbours' rows, which
+                #stop at the edges of the mesh unless it is periodic
+                fromBelow, fromAbove = self.exchange(potential[:g], potential[-g:])
+                periodic = self.gradient == 'periodic'
+                lo = g if periodic or self.x0 > 0 else 0
+                hi = g if periodic or self.x1 < nx else 0
+                ext = np.concatenate([fromBelow[g-lo:], potential, fromAbove[:hi]])
+                force_x = Deriv(ext, self.D, 0, self.order, 'onesided')[lo:lo+len(potential)]
+                force_y = Deriv(potential, self.D, 1, self.order, self.gradient)
+        self.potential = potential
+        #forces and potential with ghost rows, for stencils past the slab
+        fields = np.stack([force_x, force_y, potential], axis=-1)
+        fromBelow, fromAbove = self.exchange(fields[:g], fields[-g:])
+        self.fields = np.concatenate([fromBelow, fields, fromAbove])
+        self.forces = self.fields[g:-g,:,:2]
+
+    @Profiler.timed('pm.interpolate')
+    def interpolate(self, positions, kernel=None):
+        #mesh forces at this rank's bodies (N,2), same kernel as deposit
+        idx, w = self.stencil(positions, kernel)
+        forces = self.fields[...,:2].reshape(-1, 2)[idx]
+        return (forces*w[...,None]).sum(axis=1)
+
+    def energy(self, positions, kernel=None):
+        #this rank's part of Diagnostics.meshEnergy, to be summed over ranks
+        idx, w = self.stencil(positions, kernel)
+        psi = (self.fields[...,2].ravel()[idx]*w).sum(axis=1)
+        return -0.5*psi.sum()
+
+#function: send every body to the rank owning its slab
+def migrate(comm, grid, particles, ids):
+    #################################################
+    # particles : this rank's bodies, replaced in   #
+    #             place by those it owns now        #
+    # ids : global body numbers, returned reordered #
+    #################################################
+    owner = grid.owner(particles.r)
+    sort = np.argsort(owner, kind='stable')
+    bounds = np.searchsorted(owner[sort], np.arange(comm.size + 1))
+    parts = []
+    for k in range(comm.size):
+        s = sort[bounds[k]:bounds[k+1]]
+        parts.append((particles.m[s], particles.r[s], particles.v[s],
+                      particles.f[s], ids[s]))
+    parts = comm.alltoall(parts)
+    Profiler.count('slab.migrate', len(particles) - len(parts[comm.rank][0]))
+    particles.m, particles.r, particles.v, particles.f, ids = \
+        [np.concatenate(a) for a in zip(*parts)]
+    return ids
+
+#function: mesh forces of bodies known to every rank, on slabs
+def slabForces(comm, r, m, shape, rx, ry, D, kernel='cic', gradient='onesided', order=2):
+    #same forces as Grid.deposit, evalForce and interpolate, every rank
+    #taking its own bodies and every rank getting all forces back
+    grid = SlabGrid(comm, shape, rx, ry, D, kernel, gradient, order)
+    r = np.asarray(r, dtype=float)
+    own = np.nonzero(grid.owner(r) == comm.rank)[0]
+    grid.deposit(r[own], np.asarray(m, dtype=float)[own])
+    grid.evalForce()
+    f = np.empty(r.shape)
+    for idx, fk in comm.allgather((own, grid.interpolate(r[own]))):
+        f[idx] = fk
+    return f
+
+#function: galaxy as PMSim on slabs, called on every rank
+def simulate(comm, N, dt, steps, seed=0, kernel='cic', gradient='onesided',
+             order=2, integrator='leapfrog', every=0):
+    #################################################
+    # every : steps between energies, 0 for none    #
+    # returns at rank 0 the bodies by their number  #
+    # in the initial galaxy, energies and run time, #
+    # None on the other ranks. The galaxy depends   #
+    # on the number of ranks, and the final bodies  #
+    # are all gathered on rank 0                    #
+    #################################################
+    #Milky Way parameters, as PMSim
+    r0, m0, L = 3.0, 50.0, 15.0
+    D = L/np.sqrt(N)
+    M = int(np.ceil(2*L/D)) + 2
+    grid = SlabGrid(comm, (M, M), -L, -L, D, kernel, gradient, order)
+    #every rank draws its share of the galaxy from seed + rank, so no
+    #rank holds all bodies, and the first force evaluation sends them
+    #to their slabs. One rank draws the same galaxy as PMSim
+    share = slabs(N, comm.size)
+    first, count = share[comm.rank], share[comm.rank + 1] - share[comm.rank]
+    np.random.seed(seed + comm.rank)
+    particles = galaxyParticles(r0, m0*count/N, count, L)
+    state = {'ids': first + np.arange(len(particles))}
+
+    #function: force on every body of this rank from the slabs
+    def computeForce(particles):
+        #bodies follow the slabs they drifted into
+        state['ids'] = migrate(comm, grid, particles, state['ids'])
+        grid.resetGrid()
+        grid.deposit(particles.r, particles.m)
+        grid.evalForce()
+        particles.f[:] = grid.interpolate(particles.r)
+
+    def energy():
+        #total kinetic and mesh energy, summed over ranks
+        K = 0.5*(particles.m*(particles.v*particles.v).sum(axis=1)).sum()
+        return comm.allreduce(np.array([K, grid.energy(particles.r)]))
+
+    step = getIntegrator(integrator)
+    comm.barrier()
+    start = time.perf_counter()
+    computeForce(particles)
+    E = [energy()] if every else []
+    for i in range(steps):
+        step(particles, dt, computeForce)
+        if every and (i+1) % every == 0:
+            E.append(energy())
+    comm.barrier()
+    elapsed = time.perf_counter() - start
+    parts = comm.gather((state['ids'], particles.m, particles.r, particles.v), root=0)
+    if comm.rank != 0:
+        return None
+    ids, m, r, v = [np.concatenate(a) for a in zip(*parts)]
+    sort = np.argsort(ids)
+    return {'m': m[sort], 'r': r[sort], 'v': v[sort],
+            'E': np.array(E).reshape(-1, 2), 'time': elapsed}
+
+#function: main
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="galaxy on a slab decomposed mesh")
+    parser.add_argument('--workers', type=int, default=mp.cpu_count(),
+                        help="ranks, each holding one slab")
+    parser.add_argument('--N', type=int, default=100000)
+    parser.add_argument('--kernel', choices=kernels, default='cic')
+    parser.add_argument('--gradient', choices=gradients, default='onesided')
+    parser.add_argument('--integrator', default='leapfrog')
+    parser.add_argument('--dt', type=float, default=0.01)
+    parser.add_argument('--T', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--every', type=int, default=0, help="steps between energies")
+    parser.add_argument('--check', action='store_true',
+                        help="compare first forces with a single Grid")
+    parser.add_argument('--out', help="final bodies and energies to .npz")
+    args = parser.parse_args()
+
+    if args.check:
+        np.random.seed(args.seed)
+        galaxy = galaxyParticles(3.0, 50.0, args.N, 15.0)
+        D = 15.0/np.sqrt(args.N)
+        M = int(np.ceil(30.0/D)) + 2
+        rho = Grid(np.zeros((M, M)), -15.0, -15.0, D, kernel=args.kernel,
+                   gradient=args.gradient)
+        rho.deposit(galaxy.r, galaxy.m)
+        rho.evalForce()
+        f = launch(slabForces, args.workers, galaxy.r, galaxy.m, (M, M), -15.0, -15.0,
+                   D, args.kernel, args.gradient)[0]
+        print("largest force difference from Grid: "
+              +str(np.abs(f - rho.interpolate(galaxy.r)).max()))
+    out = launch(simulate, args.workers, args.N, args.dt, int(round(args.T/args.dt)),
+                 args.seed, args.kernel, args.gradient, 2, args.integrator, args.every)[0]
+    print(str(len(out['m']))+" bodies on "+str(args.workers)+" slabs in "
+          +str(out['time'])+" s")
+    if len(out['E']):
+        E = out['E'].sum(axis=1)
+        print("energy drift "+str((E[-1] - E[0])/abs(E[0])))
+    if args.out:
+        np.savez(args.out, m=out['m'], r=out['r'], v=out['v'], E=out['E'])
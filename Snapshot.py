@@ -0,0 +1,227 @@
+#################################################################
+# Name:     Snapshot.py                                         #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program streams masses, positions and velocities of #
+#           N bodies to a compressed snapshot file frame by     #
+#           frame, and reads any frame back without loading the #
+#           rest, for N-body simulation output.                 #
+#################################################################
+
+#essential modules
+import os
+import json
+import mmap
+import zlib
+import struct
+import numpy as np
+from types import SimpleNamespace
+
+#essential imports
+import Profiler
+
+#################################################################
+# File layout, little endian:                                   #
+#  header  : magic, uint64 length, JSON of run metadata         #
+#  frames  : 'FRME', int64 step, float64 t, uint64 N,           #
+#            uint64 payload bytes, uint32 meta bytes,           #
+#            uint32 crc32 of meta and payload, JSON meta,       #
+#            zlib payload of m (N), r (N,2), v (N,2)            #
+#  index   : 'INDX', uint64 count, uint64 offsets of frames,    #
+#            uint64 offset of index, 'NBIX'                     #
+# The index is written on close. A file cut short by a crash    #
+# has no index, and readers rebuild it from the intact frames.  #
+#################################################################
+_MAGIC = b'NBSNAP01'
+_LENGTH = struct.Struct('<Q')
+_FRAME = struct.Struct('<4sqdQQII')
+_TRAILER = struct.Struct('<Q4s')
+
+#function: offsets of intact frames, scanning from start of frames
+def _scan(buf, pos):
+    offsets = []
+    while pos + _FRAME.size <= len(buf):
+        tag, step, t, N, nbytes, nmeta, crc = _FRAME.unpack_from(buf, pos)
+        end = pos + _FRAME.size + nmeta + nbytes
+        if tag != b'FRME' or end > len(buf):
+            break
+        if zlib.crc32(buf[pos+_FRAME.size:end]) != crc:
+            break
+        offsets.append(pos)
+        pos = end
+    return offsets, pos
+
+#function: run metadata and offset of first frame
+def _header(buf):
+    if bytes(buf[:len(_MAGIC)]) != _MAGIC:
+        raise ValueError("not a snapshot file")
+    n, = _LENGTH.unpack_from(buf, len(_MAGIC))
+    start = len(_MAGIC) + _LENGTH.size
+    return json.loads(bytes(buf[start:start+n]).decode()), start + n
+
+#function: frame offsets from trailing index, or None if missing
+def _index(buf):
+    if len(buf) < _TRAILER.size:
+        return None
+    at, tag = _TRAILER.unpack_from(buf, len(buf) - _TRAILER.size)
+    if tag != b'NBIX' or at + 12 > len(buf) or bytes(buf[at:at+4]) != b'INDX':
+        return None
+    count, = _LENGTH.unpack_from(buf, at + 4)
+    if at + 12 + 8*count + _TRAILER.size != len(buf):
+        return None
+    return np.frombuffer(buf, dtype='<u8', count=count, offset=at + 12)
+
+#class: writer streaming frames to a snapshot file
+class SnapshotWriter:
+    """appends compressed frames of a particle set to a file"""
+    def __init__(self, path, every=1, meta=None, append=False, level=6,
+                 lastStep=None):
+        #################################################
+        # every : write only steps divisible by every   #
+        # meta : JSON serialisable run metadata         #
+        # append : continue an existing file, keeping   #
+        #          its metadata and intact frames       #
+        # level : zlib compression level                #
+        # lastStep : on append, also drop frames after  #
+        #            this step, such as those written   #
+        #            after the checkpoint resumed from  #
+        #################################################
+        self.path = path
+        self.every = every
+        self.level = level
+        if append and os.path.exists(path):
+            #mapped as SnapshotReader, so resuming never loads the file
+            with open(path, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self.meta, start = _header(buf)
+                index = _index(buf)
+                if index is not None:
+                    #closed file, frames end where its index starts
+                    self.offsets = [int(pos) for pos in index]
+                    end = _TRAILER.unpack_from(buf, len(buf) - _TRAILER.size)[0]
+                    del index
+                else:
+                    #no index, keep the frames before any cut short
+                    self.offsets, end = _scan(buf, start)
+                if lastStep is not None:
+                    steps = [_FRAME.unpack_from(buf, pos)[1] for pos in self.offsets]
+                    keep = np.searchsorted(steps, lastStep, side='right')
+                    if keep < len(self.offsets):
+                        end = self.offsets[keep]
+                    self.offsets = self.offsets[:keep]
+            finally:
+                buf.close()
+            self.file = open(path, 'r+b')
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.meta = {} if meta is None else meta
+            text = json.dumps(self.meta).encode()
+            self.file = open(path, 'wb')
+            self.file.write(_MAGIC + _LENGTH.pack(len(text)) + text)
+            self.offsets = []
+        self.file.flush()
+
+    @Profiler.timed('io.snapshot')
+    def write(self, particles, step, t=0.0, meta=None):
+        #write frame of particles if step is due, returns if written
+        if step % self.every != 0:
+            return False
+        data = np.concatenate([particles.m.ravel(), particles.r.ravel(),
+                               particles.v.ravel()]).astype('<f8')
+        payload = zlib.compress(data.tobytes(), self.level)
+        text = b'' if meta is None else json.dumps(meta).encode()
+        crc = zlib.crc32(payload, zlib.crc32(text))
+        self.offsets.append(self.file.tell())
+        self.file.write(_FRAME.pack(b'FRME', step, t, len(particles.m),
+                                    len(payload), len(text), crc))
+        self.file.write(text)
+        self.file.write(payload)
+        #frames reach the file as they are written, so a crash loses
+        #at most the frame in progress
+        self.file.flush()
+        return True
+
+    def close(self):
+        if self.file.closed:
+            return
+        at = self.file.tell()
+        self.file.write(b'INDX' + _LENGTH.pack(len(self.offsets)))
+        self.file.write(np.asarray(self.offsets, dtype='<u8').tobytes())
+        self.file.write(_TRAILER.pack(at, b'NBIX'))
+        self.file.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
+
+#class: random access reader of a snapshot file
+class SnapshotReader:
+    """memory maps a snapshot file and decodes frames on demand"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.meta, start = _header(self.buf)
+        offsets = _index(self.buf)
+        if offsets is None:
+            #no index, writer did not close, recover intact frames
+            offsets = _scan(self.buf, start)[0]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        #number of frames
+        return len(self.offsets)
+
+    def header(self, i):
+        #step, time, number of bodies and meta of frame i, no payload
+        pos = int(self.offsets[i])
+        tag, step, t, N, nbytes, nmeta, crc = _FRAME.unpack_from(self.buf, pos)
+        pos += _FRAME.size
+        meta = json.loads(bytes(self.buf[pos:pos+nmeta]).decode()) if nmeta else {}
+        return SimpleNamespace(step=step, t=t, N=N, meta=meta)
+
+    def __getitem__(self, i):
+        #frame i with step, t, meta and arrays m (N,), r, v (N,2)
+        frame = self.header(i)
+        pos = int(self.offsets[i])
+        nbytes, nmeta = _FRAME.unpack_from(self.buf, pos)[4:6]
+        pos += _FRAME.size + nmeta
+        data = np.frombuffer(zlib.decompress(self.buf[pos:pos+nbytes]), dtype='<f8')
+        N = frame.N
+        frame.m = data[:N]
+        frame.r = data[N:3*N].reshape(N, 2)
+        frame.v = data[3*N:].reshape(N, 2)
+        return frame
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        self.buf.close()
+        self.file.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        self.close()
+
+#function: render snapshot file to a movie, one frame in memory at a time
+def movie(path, out, L, interval=100, style='k.'):
+    #plotting only needed here, so imported here
+    import matplotlib.pyplot as plt
+    import matplotlib.animation as animation
+    with SnapshotReader(path) as snaps:
+        fig = plt.figure()
+        ax = plt.axes(xlim=(-L, L), ylim=(-L, L))
+        scatter, = ax.plot([], [], style)
+        def draw(i):
+            position = snaps[i].r.T
+            scatter.set_data(position[0], position[1])
+            return scatter,
+        anim = animation.FuncAnimation(fig, draw, frames=len(snaps),
+                                       interval=interval, blit=True)
+        anim.save(out)
+        plt.close(fig)
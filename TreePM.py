@@ -0,0 +1,126 @@
+#################################################################
+# Name:     TreePM.py                                           #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program computes forces on N bodies interacting     #
+#           under gravity by splitting the potential, long      #
+#           range from an FFT mesh and short range from a       #
+#           truncated Barnes-Hut tree walk.                     #
+#################################################################
+
+#essential modules
+import numpy as np
+from functools import lru_cache, partial
+
+#essential imports
+from Body import G
+from PMGrid import Grid
+from LinearTree import LinearTree
+from TreeWalk import treeAccel
+from Backends import getBackend
+import Profiler
+
+#################################################################
+# The potential -Gm/r of every body is split with a Gaussian of #
+# width rs into a smooth long range part -Gm erf(r/2rs)/r and a #
+# short range part -Gm erfc(r/2rs)/r. Their forces are          #
+#  long:  -Gm r/r^3 [erf(r/2rs) - r/(rs sqrt(pi)) e^(-r^2/4rs^2)] #
+#  short: -Gm r/r^3 [erfc(r/2rs) + r/(rs sqrt(pi)) e^(-r^2/4rs^2)]#
+# which add up to the full force. The short part is negligible  #
+# beyond a few rs, so the tree walk stops there.                #
+#################################################################
+
+#function: complementary error function, |error| < 1.5e-7
+def erfc(x):
+    #Abramowitz & Stegun 7.1.26, x >= 0
+    t = 1.0/(1.0 + 0.3275911*x)
+    poly = t*(0.254829592 + t*(-0.284496736 + t*(1.421413741
+              + t*(-1.453152027 + t*1.061405429))))
+    return poly*np.exp(-x*x)
+
+#function: fraction of the force felt at squared distance r2 in short range
+def shortRange(r2, rs):
+    r = np.sqrt(r2)
+    return erfc(0.5*r/rs) + r/(rs*np.sqrt(np.pi))*np.exp(-0.25*r2/rs**2)
+
+#function: Fourier transform of long range force of unit mass on mesh
+@lru_cache(maxsize=16)
+def longKernel(shape, D, rs):
+    #################################################
+    # shape : zero padded mesh, twice the box, so   #
+    #         the circular convolution is isolated  #
+    # D : mesh spacing, rs : split scale            #
+    #################################################
+    #separations to every mesh point, nearest image
+    i = np.fft.fftfreq(shape[0], 1.0/shape[0])[:,None]*D
+    j = np.fft.fftfreq(shape[1], 1.0/shape[1])[None,:]*D
+    r2 = i*i + j*j
+    #long range part is the full force less the short range part
+    inv = np.zeros(shape)
+    np.power(r2, -1.5, out=inv, where=r2 > 0)
+    w = -G*inv*(1.0 - shortRange(r2, rs))
+    kx = np.fft.rfft2(w*i)
+    ky = np.fft.rfft2(w*j)
+    #shared between solvers and time steps, so never modified
+    kx.flags.writeable = False
+    ky.flags.writeable = False
+    return kx, ky
+
+#class: hybrid tree and particle mesh force solver
+class TreePM:
+    """long range forces from FFT mesh, short range from tree walk"""
+    def __init__(self, quad, M, epsilon, theta=0.7, rs=1.25, rcut=4.5,
+                 kernel='cic', leafSize=8, groupSize=16, expansionOrder=2,
+                 rebuildInterval=1, pool=None):
+        #################################################
+        # quad : box holding every body, meshed by MxM  #
+        # epsilon : softening of short range forces    #
+        # rs : split scale, in mesh spacings            #
+        # rcut : short range cutoff, in units of rs     #
+        # pool : optional ParallelForce for the walk    #
+        #################################################
+        self.quad = quad
+        self.M = M
+        self.D = quad.L/M
+        self.rs = rs*self.D
+        self.rcut = rcut*self.rs
+        self.epsilon = epsilon
+        self.theta = theta
+        self.groupSize = groupSize
+        #bodies fill only the lower left quarter of the padded mesh
+        self.grid = Grid(np.zeros((2*M, 2*M)), quad.r[0], quad.r[1], self.D,
+                         kernel=kernel)
+        self.tree = LinearTree(quad, leafSize=leafSize,
+                               expansionOrder=expansionOrder,
+                               rebuildInterval=rebuildInterval)
+        self.pool = pool
+        #picklable, so workers of a pool can apply it
+        self.split = partial(shortRange, rs=self.rs)
+
+    @Profiler.timed('treepm.long')
+    def longAccel(self, r, m):
+        #long range accelerations (N,2) from mesh
+        grid = self.grid
+        grid.resetGrid()
+        getBackend().deposit(grid, r, m)
+        kx, ky = longKernel(grid.array.shape, self.D, self.rs)
+        with Profiler.phase('pm.fft'):
+            mass_fft = np.fft.rfft2(grid.array)
+            shape = grid.array.shape
+            grid.forces = np.stack([np.fft.irfft2(mass_fft*kx, s=shape),
+                                    np.fft.irfft2(mass_fft*ky, s=shape)], axis=-1)
+        return grid.interpolate(r)
+
+    def shortAccel(self, r, m):
+        #short range accelerations (N,2) from tree walk within rcut
+        self.tree.update(r, m)
+        walk = self.pool.treeAccel if self.pool else treeAccel
+        return walk(self.tree, self.theta, self.epsilon, self.groupSize,
+                    split=self.split, cutoff=self.rcut)
+
+    def accel(self, r, m):
+        #total accelerations (N,2), bodies must stay inside quad
+        r = np.asarray(r, dtype=float)
+        m = np.asarray(m, dtype=float)
+        return self.longAccel(r, m) + self.shortAccel(r, m)
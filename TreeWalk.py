@@ -0,0 +1,273 @@
+#################################################################
+# Name:     TreeWalk.py                                         #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program evaluates Barnes-Hut forces on all bodies   #
+#           of a linear quadtree at once, walking the tree for  #
+#           groups of neighbouring bodies together.             #
+#################################################################
+
+#essential modules
+import numpy as np
+
+#essential imports
+from Body import G
+from Quad import Quad
+from LinearTree import LinearTree, ranges, rangeReduce
+import Profiler
+
+#function: sink groups, the largest nodes holding at most groupSize bodies
+def sinkGroups(tree, groupSize):
+    count = tree.end - tree.start
+    pcount = np.where(tree.parent >= 0, count[tree.parent], np.inf)
+    small = (count <= groupSize) & (pcount > groupSize)
+    #crowded leaves at the deepest level cannot be split further
+    crowded = tree.external & (count > groupSize)
+    groups = np.nonzero(small | crowded)[0]
+    return groups[np.argsort(tree.start[groups], kind='stable')]
+
+#function: groups holding sink bodies, and sorted positions of the sinks
+def activeGroups(tree, groups, sinks):
+    #################################################
+    # sinks : original indices of bodies needing    #
+    #         forces, such as active bodies of a    #
+    #         block time step                       #
+    #################################################
+    rank = np.empty_like(tree.order)
+    rank[tree.order] = np.arange(len(rank))
+    pos = rank[np.asarray(sinks, dtype=int)]
+    #groups are sorted by start and cover every body once
+    held = np.searchsorted(tree.start[groups], pos, side='right') - 1
+    return groups[np.unique(held)], pos
+
+#function: interaction lists of sink groups with tree nodes
+def interactionLists(tree, theta, groups, cutoff=np.inf):
+    #################################################
+    # cutoff : nodes with every body further than   #
+    #          cutoff from the group are skipped    #
+    # far: (group, node) pairs far enough to use    #
+    #      the node center of mass                  #
+    # near: (group, leaf) pairs summed body by body #
+    #################################################
+    gs, ge = tree.start[groups], tree.end[groups]
+    #bounding box of bodies in each group
+    lo = rangeReduce(np.minimum, tree.r, gs, ge)
+    hi = rangeReduce(np.maximum, tree.r, gs, ge)
+    #walk the tree breadth first for every group at once
+    g = np.arange(len(groups))
+    n = np.zeros(len(groups), dtype=int)
+    far, near = [], []
+    while len(g) > 0:
+        #closest distance from node center of mass to group box
+        c = tree.com[n]
+        dr = np.maximum(np.maximum(lo[g] - c, c - hi[g]), 0.0)
+        d = np.sqrt((dr*dr).sum(axis=1))
+        if cutoff < np.inf:
+            #bodies of a node lie within sqrt(2) size of its center of mass
+            keep = d - np.sqrt(2)*tree.size[n] <= cutoff
+            g, n, d = g[keep], n[keep], d[keep]
+        #nodes holding the group are never far from it
+        holds = (tree.start[n] <= gs[g]) & (ge[g] <= tree.end[n])
+        #same opening criterion as BHTree: L/d < theta
+        accept = ~holds & (tree.size[n] < theta*d)
+        far.append((g[accept], n[accept]))
+        leaf = ~accept & tree.external[n]
+        near.append((g[leaf], n[leaf]))
+        #box too close, continue with children instead
+        open_ = ~accept & ~leaf
+        g, n = g[open_], n[open_]
+        k = tree.nchild[n]
+        g = np.repeat(g, k)
+        n = ranges(tree.child[n], tree.child[n] + k)
+    far = [np.concatenate(x) for x in zip(*far)]
+    near = [np.concatenate(x) for x in zip(*near)]
+    #order pairs by group, keeping walk order within each group
+    far = [x[np.argsort(far[0], kind='stable')] for x in far]
+    near = [x[np.argsort(near[0], kind='stable')] for x in near]
+    return far, near
+
+#function: softened gravitational acceleration of sinks due to sources
+def _kernel(dr, m, epsilon, split=None):
+    #################################################
+    # split : optional function of squared distance #
+    #         scaling the force, for short range    #
+    #         part of a split force law             #
+    #################################################
+    r2 = (dr*dr).sum(axis=1)
+    d2 = r2 + epsilon**2
+    #coincident bodies exert no force on each other, as in BHTree
+    inv = np.zeros_like(d2)
+    np.power(d2, -1.5, out=inv, where=d2 > 0)
+    if split is not None:
+        inv *= split(r2)
+    return -G*(m*inv)[:,None]*dr
+
+#function: softened acceleration of sinks due to node expansions
+def _farKernel(dr, tree, node, epsilon, split=None):
+    acc = _kernel(dr, tree.mass[node], epsilon)
+    if tree.expansionOrder == 2:
+        #quadrupole term of the softened potential, with s^2 = r^2 + eps^2
+        #and trace t = Qxx + Qyy of the plane second moment,
+        #a = G[(Qx + t x)/s^5 - 5/2 (xQx + t r^2) x/s^7 + 3/2 t x/s^5]
+        Q = tree.quadrupole[node]
+        t = Q[:,0] + Q[:,2]
+        Qx = np.stack([Q[:,0]*dr[:,0] + Q[:,1]*dr[:,1],
+                       Q[:,1]*dr[:,0] + Q[:,2]*dr[:,1]], axis=1)
+        r2 = (dr*dr).sum(axis=1)
+        s2 = r2 + epsilon**2
+        inv5 = s2**-2.5
+        xQx = (dr*Qx).sum(axis=1) + t*r2
+        acc += G*inv5[:,None]*(Qx + (2.5*t - 2.5*xQx/s2)[:,None]*dr)
+    if split is not None:
+        #whole expansion scaled at its center of mass
+        acc *= split((dr*dr).sum(axis=1))[:,None]
+    return acc
+
+#function: split pair list into chunks of whole groups
+def _chunks(g, work, chunkSize):
+    if len(g) == 0:
+        return []
+    #pair index one past the end of each run of one group
+    ends = np.append(np.nonzero(g[1:] != g[:-1])[0] + 1, len(g))
+    cum = np.cumsum(work)[ends - 1]
+    bounds, done, i = [0], 0, 0
+    while i < len(ends):
+        #take whole groups until chunk is full, at least one group
+        j = max(np.searchsorted(cum, done + chunkSize, side='right'), i + 1)
+        bounds.append(ends[j-1])
+        done, i = cum[j-1], j
+    return list(zip(bounds[:-1], bounds[1:]))
+
+#function: add per pair accelerations onto their sinks
+def _accumulate(acc, sink, da):
+    #sinks of a chunk lie in one contiguous run of sorted bodies
+    lo, hi = sink.min(), sink.max() + 1
+    acc[lo:hi,0] += np.bincount(sink - lo, da[:,0], minlength=hi - lo)
+    acc[lo:hi,1] += np.bincount(sink - lo, da[:,1], minlength=hi - lo)
+
+#function: accelerations on sorted bodies of selected groups
+@Profiler.timed('tree.walk')
+def walkAccel(tree, theta, epsilon, groups, chunkSize=2**20, out=None,
+              split=None, cutoff=np.inf):
+    #################################################
+    # out : optional (N,2) array accumulating the   #
+    #       accelerations, only rows of bodies in   #
+    #       groups are touched                      #
+    # split, cutoff : short range force scaling and #
+    #       range beyond which it is neglected      #
+    #################################################
+    far, near = interactionLists(tree, theta, groups, cutoff)
+    count = tree.end - tree.start
+    if Profiler.enabled:
+        #body-node interactions of far field, body-body of near field
+        Profiler.count('walk.node', count[groups[far[0]]].sum())
+        Profiler.count('walk.body', (count[groups[near[0]]]*count[near[1]]).sum())
+    acc = np.zeros((len(tree.m), 2)) if out is None else out
+
+    #far field: node expansion acting on every sink in group
+    g, n = far
+    for a, b in _chunks(g, count[groups[g]], chunkSize):
+        gs, ge = tree.start[groups[g[a:b]]], tree.end[groups[g[a:b]]]
+        sink = ranges(gs, ge)
+        node = np.repeat(n[a:b], ge - gs)
+        da = _farKernel(tree.r[sink] - tree.com[node], tree, node, epsilon, split)
+        _accumulate(acc, sink, da)
+
+    #near field: every body of leaf acting on every sink in group
+    g, n = near
+    for a, b in _chunks(g, count[groups[g]]*count[n], chunkSize):
+        gs, ge = tree.start[groups[g[a:b]]], tree.end[groups[g[a:b]]]
+        sink = ranges(gs, ge)
+        leaf = np.repeat(n[a:b], ge - gs)
+        k = count[leaf]
+        src = ranges(tree.start[leaf], tree.end[leaf])
+        sink = np.repeat(sink, k)
+        da = _kernel(tree.r[sink] - tree.r[src], tree.m[src], epsilon, split)
+        _accumulate(acc, sink, da)
+    return acc
+
+#function: Barnes-Hut accelerations of every body in a built tree
+def treeAccel(tree, theta, epsilon, groupSize=16, chunkSize=2**20,
+              split=None, cutoff=np.inf, sinks=None):
+    #with sinks, only groups holding them are walked and the
+    #accelerations of the sinks (len(sinks),2) are returned
+    groups = sinkGroups(tree, groupSize)
+    if sinks is not None:
+        groups, pos = activeGroups(tree, groups, sinks)
+        acc = walkAccel(tree, theta, epsilon, groups, chunkSize,
+                        split=split, cutoff=cutoff)
+        return acc[pos]
+    acc = walkAccel(tree, theta, epsilon, groups, chunkSize,
+                    split=split, cutoff=cutoff)
+    #return accelerations in original body order
+    out = np.empty_like(acc)
+    out[tree.order] = acc
+    return out
+
+#function: softened potential at sinks due to node expansions
+def _farPotential(dr, tree, node, epsilon):
+    r2 = (dr*dr).sum(axis=1)
+    s2 = r2 + epsilon**2
+    phi = -G*tree.mass[node]/np.sqrt(s2)
+    if tree.expansionOrder == 2:
+        #quadrupole term, second moment S = (Q + t)/3 of the plane,
+        #phi = -G/2 [(xQx + t r^2)/s^5 - t/s^3]
+        Q = tree.quadrupole[node]
+        t = Q[:,0] + Q[:,2]
+        xQx = (Q[:,0]*dr[:,0]*dr[:,0] + 2*Q[:,1]*dr[:,0]*dr[:,1]
+               + Q[:,2]*dr[:,1]*dr[:,1])
+        phi -= 0.5*G*((xQx + t*r2)/s2 - t)*s2**-1.5
+    return phi
+
+#function: potentials per unit mass of sorted bodies of selected groups
+@Profiler.timed('tree.potential')
+def walkPotential(tree, theta, epsilon, groups, chunkSize=2**20):
+    #same interaction lists and chunks as walkAccel
+    far, near = interactionLists(tree, theta, groups)
+    count = tree.end - tree.start
+    phi = np.zeros(len(tree.m))
+
+    g, n = far
+    for a, b in _chunks(g, count[groups[g]], chunkSize):
+        gs, ge = tree.start[groups[g[a:b]]], tree.end[groups[g[a:b]]]
+        sink = ranges(gs, ge)
+        node = np.repeat(n[a:b], ge - gs)
+        dp = _farPotential(tree.r[sink] - tree.com[node], tree, node, epsilon)
+        phi += np.bincount(sink, dp, minlength=len(phi))
+
+    g, n = near
+    for a, b in _chunks(g, count[groups[g]]*count[n], chunkSize):
+        gs, ge = tree.start[groups[g[a:b]]], tree.end[groups[g[a:b]]]
+        sink = ranges(gs, ge)
+        leaf = np.repeat(n[a:b], ge - gs)
+        src = ranges(tree.start[leaf], tree.end[leaf])
+        sink = np.repeat(sink, count[leaf])
+        dr = tree.r[sink] - tree.r[src]
+        d2 = (dr*dr).sum(axis=1) + epsilon**2
+        #no energy of a body with itself or one on top of it
+        inv = np.zeros_like(d2)
+        np.divide(1.0, np.sqrt(d2), out=inv, where=(d2 > 0) & (sink != src))
+        phi -= G*np.bincount(sink, tree.m[src]*inv, minlength=len(phi))
+    return phi
+
+#function: Barnes-Hut potentials per unit mass of every body in a built tree
+def treePotential(tree, theta, epsilon, groupSize=16, chunkSize=2**20):
+    #total potential energy is 0.5*sum(m*phi)
+    phi = walkPotential(tree, theta, epsilon, sinkGroups(tree, groupSize), chunkSize)
+    out = np.empty_like(phi)
+    out[tree.order] = phi
+    return out
+
+#function: Barnes-Hut accelerations from positions and masses
+def bhAccel(r, m, epsilon, theta=1.0, quad=None, leafSize=8, groupSize=16,
+            expansionOrder=0):
+    r = np.asarray(r, dtype=float)
+    if quad is None:
+        #smallest square holding every body
+        lo, hi = r.min(axis=0), r.max(axis=0)
+        L = (hi - lo).max()*(1.0 + 1e-9) + 1e-300
+        quad = Quad(lo[0], lo[1], L)
+    tree = LinearTree(quad, leafSize=leafSize,
+                      expansionOrder=expansionOrder).build(r, m)
+    return treeAccel(tree, theta, epsilon, groupSize)
@@ -9,20 +9,84 @@
 import numpy as np
 
 #function: evaluate gradient on an image
-def Grad(image, h):
+def Grad(image, h, order=2, boundary='onesided'):
     #################################################
     # image: 2D array of x, y indexed pixels        #
     # h : float pixel physical size		    #
+    # order : 2 or 4, order of central difference   #
+    # boundary : 'onesided' differences at edges    #
+    #            or 'periodic' wrapping             #
     #################################################
+    image = np.asarray(image, dtype=float)
     #2D arrays of partial derivatives at each point
-    ddx = np.zeros(image.shape,float)
-    ddy = np.zeros(image.shape,float)
-    #for every row
-    for i in range(image.shape[0]):
-        #read every element of row
-        for j in range(image.shape[1]):
-            #take partial derivatives
-            ddx[i][j], ddy[i][j] = Diff(image,h,i,j)
+    ddx = Deriv(image, h, 0, order, boundary)
+    ddy = Deriv(image, h, 1, order, boundary)
+    #################################################
+    # ddx: 2D array of partial x derivatives        #
+    # ddy: 2D array of partial y derivatives	    #
+    #################################################
+    return ddx, ddy
+
+#function: evaluate partial derivative along one axis by slicing
+def Deriv(image, h, axis, order=2, boundary='onesided'):
+    #################################################
+    # image: 2D array of x, y indexed pixels        #
+    # h : float pixel physical size		    #
+    # axis : int axis to differentiate along        #
+    #################################################
+    if order not in (2, 4):
+        raise ValueError("order must be 2 or 4")
+    f = np.moveaxis(np.asarray(image, dtype=float), axis, 0)
+    if boundary == 'periodic':
+        #central difference wrapping around edges
+        if order == 2:
+            d = (np.roll(f, -1, 0)-np.roll(f, 1, 0))/(2*h)
+        else:
+            d = (-np.roll(f, -2, 0)+8*np.roll(f, -1, 0)
+                 -8*np.roll(f, 1, 0)+np.roll(f, 2, 0))/(12*h)
+    elif boundary == 'onesided':
+        d = np.zeros(f.shape)
+        if f.shape[0] > 1:
+            #take central difference
+            d[1:-1] = (f[2:]-f[:-2])/(2*h)
+            if order == 4:
+                #fourth order away from the two outermost pixels
+                d[2:-2] = (-f[4:]+8*f[3:-1]-8*f[1:-3]+f[:-4])/(12*h)
+            #take forward and backward difference on edges
+            d[0] = (f[1]-f[0])/h
+            d[-1] = (f[-1]-f[-2])/h
+    else:
+        raise ValueError("boundary must be 'onesided' or 'periodic'")
+    #################################################
+    # d: 2D array of partial derivatives            #
+    #################################################
+    return np.moveaxis(d, 0, axis)
+
+#function: evaluate periodic gradient by multiplying by ik in Fourier space
+def FourierGrad(image, h):
+    #################################################
+    # image: 2D array of x, y indexed pixels        #
+    # h : float pixel physical size		    #
+    #################################################
+    image = np.asarray(image, dtype=float)
+    return SpectralGrad(np.fft.rfft2(image), image.shape, h)
+
+#function: evaluate gradient from rfft2 of an image
+def SpectralGrad(image_fft, shape, h):
+    #################################################
+    # image_fft: rfft2 of 2D array of pixels        #
+    # shape : shape of real space image             #
+    # h : float pixel physical size		    #
+    #################################################
+    kx = 2*np.pi*np.fft.fftfreq(shape[0], h)[:,None]
+    ky = 2*np.pi*np.fft.rfftfreq(shape[1], h)[None,:]
+    #Nyquist modes have no odd part, their derivative vanishes
+    if shape[0] % 2 == 0:
+        kx[shape[0]//2] = 0.0
+    if shape[1] % 2 == 0:
+        ky[0,-1] = 0.0
+    ddx = np.fft.irfft2(1j*kx*image_fft, s=shape)
+    ddy = np.fft.irfft2(1j*ky*image_fft, s=shape)
     #################################################
     # ddx: 2D array of partial x derivatives        #
     # ddy: 2D array of partial y derivatives	    #
@@ -72,21 +136,14 @@ if __name__ == '__main__':
     #Shuttle Radar Topography Mission (SRTM) data.  #
     #################################################
     #essential imports
-    import struct #for reading binary files
     import matplotlib.pyplot as plt
     from matplotlib import cm
     
     #file containing toronto topograph
     filename = "N43W080.hgt"
     f=open(filename,'rb')
-    #load image from binary file (height image)
-    w = np.zeros((1201,1201),float)
-    #for every row
-    for i in range(1201):
-        #read every element of row
-        for j in range(1201):
-            buf = f.read(2) #read two bytes
-            w[i][j] = struct.unpack('>h', buf)[0]
+    #load image from binary file (height image), big endian shorts
+    w = np.fromfile(f, dtype='>i2', count=1201*1201).reshape(1201,1201).astype(float)
 
     #mesh distance [m]
     h = 420.0
@@ -0,0 +1,352 @@
+#################################################################
+# Name:     nbody.py                                            #
+# Authors:  Chris (Yuan Qi) Ni                                  #
+#           Michael Battaglia                                   #
+# Date:     October 18, 2026                                    #
+# Function: Program runs an N-body simulation described by a    #
+#           TOML or JSON config file from the command line,     #
+#           headless, writing snapshots and checkpoints.        #
+#                                                               #
+#   python nbody.py run galaxy.toml [--resume] [--set k=v]      #
+#   python nbody.py movie galaxy.nbs galaxy.mp4                 #
+#################################################################
+
+#essential modules
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from functools import partial
+
+#essential imports
+from Quad import Quad
+from MCgalaxy import galaxyParticles, uniformParticles
+from LinearTree import LinearTree
+from PMGrid import Grid
+from AMRGrid import AMRGrid
+from TreePM import TreePM
+from FMM import fmmAccel
+from DirectSum import directPotential
+from Diagnostics import Diagnostics, treeEnergy, meshEnergy
+from Integrator import BlockStep, getIntegrator
+from Backends import getBackend, setBackend
+from Snapshot import SnapshotWriter, SnapshotReader, movie
+import Checkpoint
+import Profiler
+
+#################################################################
+# Config sections and their defaults. None means derived from   #
+# the rest: epsilon = L/sqrt(N) times theta for the tree,       #
+# mesh spacing = L/sqrt(N), backend from NBODY_BACKEND.         #
+#################################################################
+defaults = {
+    'run': {'name': 'nbody', 'dt': 0.1, 'T': 10.0, 'seed': None},
+    'initial': {'kind': 'galaxy', 'N': 1000, 'L': 15.0,
+                #galaxy: scale length and mass, uniform: density, speed
+                'r0': 3.0, 'm0': 50.0, 'rho': 1.0, 'v0': 0.0},
+    'solver': {'kind': 'bh', 'theta': 1.0, 'epsilon': None,
+               #tree
+               'leafSize': 8, 'groupSize': 16, 'expansionOrder': 2,
+               'rebuildInterval': 4,
+               #mesh
+               'spacing': None, 'kernel': 'cic', 'gradient': 'onesided',
+               'order': 2,
+               #mesh refinement levels, 0 for none, and point mass refined
+               #above, None for twice the mean body mass
+               'refineLevels': 0, 'refineMass': None,
+               #treepm split scale and cutoff, in mesh spacings and rs
+               'rs': 1.25, 'rcut': 4.5,
+               #force law, checked against the solver's own in forceLaws,
+               #None to take it from the solver, except for fmm
+               'gravity': None,
+               #fmm expansion terms
+               'fmmOrder': 12},
+    'integrator': {'name': 'leapfrog', 'eta': 0.2, 'maxLevel': 6},
+    'output': {'dir': '.', 'every': 1, 'checkpointEvery': 10, 'log': 1,
+               #steps between energy records to name.diag.jsonl, 0 for none
+               'diagnostics': 0,
+               #per-step phase times, to name.profile.jsonl and snapshots
+               'profile': False},
+    'parallel': {'workers': 1, 'backend': None},
+}
+solvers = ('brute', 'bh', 'pm', 'treepm')
+#solvers run only when solver.gravity names their force law
+otherSolvers = ('fmm',)
+#force law of every solver, 'plane' the 1/r^2 force of Body, 'log2d'
+#the 1/r force of 2D gravity from the discrete Poisson equation of the
+#mesh or the logarithmic potential of the multipoles
+forceLaws = {'brute': 'plane', 'bh': 'plane', 'treepm': 'plane',
+             'pm': 'log2d', 'fmm': 'log2d'}
+
+#function: parse TOML or JSON config file, by extension
+def readConfig(path):
+    if path.endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("TOML configs need python 3.11, use JSON instead")
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+#function: config with defaults filled in, overrides as 'section.key=value'
+def loadConfig(path=None, overrides=()):
+    config = {section: dict(values) for section, values in defaults.items()}
+    given = readConfig(path) if path else {}
+    for item in overrides:
+        key, _, text = item.partition('=')
+        section, _, name = key.partition('.')
+        try:
+            value = json.loads(text)
+        except ValueError:
+            value = text
+        given.setdefault(section, {})[name] = value
+    #unknown names are typos, never silently ignored
+    for section, values in given.items():
+        if section not in config:
+            raise ValueError("unknown config section '"+str(section)+"'")
+        for name, value in values.items():
+            if name not in config[section]:
+                raise ValueError("unknown config key '"+section+"."+str(name)+"'")
+            config[section][name] = value
+    if config['solver']['kind'] not in solvers + otherSolvers:
+        raise ValueError("unknown solver '"+str(config['solver']['kind'])
+                         +"', choose from "+", ".join(solvers))
+    return config
+
+#function: initial particle set
+def makeParticles(config):
+    ini = config['initial']
+    if ini['kind'] == 'galaxy':
+        return galaxyParticles(ini['r0'], ini['m0'], ini['N'], ini['L'])
+    if ini['kind'] == 'uniform':
+        return uniformParticles(ini['rho'], ini['v0'], ini['N'], ini['L'])
+    raise ValueError("unknown initial conditions '"+str(ini['kind'])
+                     +"', choose from galaxy, uniform")
+
+#function: softening length of config
+def softening(config):
+    ini, sol = config['initial'], config['solver']
+    if sol['epsilon'] is not None:
+        return sol['epsilon']
+    #as BHSim, softening shrinks with more bodies
+    return sol['theta']*ini['L']/np.sqrt(ini['N'])
+
+#function: force evaluation and objects whose state is checkpointed
+def makeForce(config, pool=None):
+    #################################################
+    # returns computeForce(particles, active=None)  #
+    # filling particles.f for active bodies, a dict #
+    # of objects with state() and restore(), and    #
+    # potential(particles), energy from the state   #
+    # of the last computeForce, None if unknown     #
+    #################################################
+    ini, sol = config['initial'], config['solver']
+    L, kind = ini['L'], sol['kind']
+    #a force law asked for is never silently replaced by another
+    law = forceLaws[kind]
+    if sol['gravity'] not in (None, law):
+        raise ValueError("solver '"+str(kind)+"' solves solver.gravity='"+law
+                         +"', not '"+str(sol['gravity'])+"'")
+    if sol['gravity'] is None and kind in otherSolvers:
+        raise ValueError("solver '"+str(kind)+"' needs solver.gravity='"+law+"'")
+    epsilon = softening(config)
+    D = sol['spacing'] if sol['spacing'] else L/np.sqrt(ini['N'])
+    backend = getBackend()
+    if kind == 'brute':
+        pair = pool.directAccel if pool else backend.pairAccel
+        def computeForce(particles, active=None):
+            if active is None:
+                particles.f[:] = particles.m[:,None]*pair(particles.r, particles.m, epsilon)
+            else:
+                #few active sinks, not worth the pool
+                particles.f[active] = (particles.m[active,None]
+                                       *backend.pairAccel(particles.r, particles.m,
+                                                          epsilon, sinks=active))
+        def potential(particles):
+            return directPotential(particles.r, particles.m, epsilon)
+        return computeForce, {}, potential
+    if kind == 'bh':
+        tree = LinearTree(Quad(-L,-L,2*L), leafSize=sol['leafSize'],
+                          expansionOrder=sol['expansionOrder'],
+                          rebuildInterval=sol['rebuildInterval'])
+        walk = pool.treeAccel if pool else backend.treeAccel
+        def computeForce(particles, active=None):
+            tree.update(particles.r, particles.m)
+            if active is None:
+                particles.f[:] = particles.m[:,None]*walk(tree, sol['theta'], epsilon)
+            else:
+                particles.f[active] = (particles.m[active,None]
+                                       *walk(tree, sol['theta'], epsilon, sinks=active))
+        def potential(particles):
+            return treeEnergy(tree, particles.m, sol['theta'], epsilon, sol['groupSize'])
+        return computeForce, {'tree': tree}, potential
+    if kind == 'pm':
+        #grid as PMSim, two spare cells past the box
+        M = int(np.ceil(2*L/D)) + 2
+        if sol['refineLevels']:
+            rho = AMRGrid(np.zeros((M, M)), -L, -L, D, kernel=sol['kernel'],
+                          gradient=sol['gradient'], order=sol['order'],
+                          levels=sol['refineLevels'], threshold=sol['refineMass'])
+            #patches are placed from the bodies the grid itself deposited
+            deposit = rho.deposit
+        else:
+            rho = Grid(np.zeros((M, M)), -L, -L, D, kernel=sol['kernel'],
+                       gradient=sol['gradient'], order=sol['order'])
+            deposit = partial(backend.deposit, rho)
+        def computeForce(particles, active=None):
+            rho.resetGrid()
+            deposit(particles.r, particles.m)
+            rho.evalForce()
+            if active is None:
+                particles.f[:] = rho.interpolate(particles.r)
+            else:
+                particles.f[active] = rho.interpolate(particles.r[active])
+        def potential(particles):
+            return meshEnergy(rho, particles.r)
+        return computeForce, {}, potential
+    if kind == 'fmm':
+        #1/r force of 2D gravity, like pm but not the tree solvers,
+        #in a box fitted around the bodies every step
+        def computeForce(particles, active=None):
+            acc = fmmAccel(particles.r, particles.m, epsilon,
+                           order=sol['fmmOrder'])
+            if active is None:
+                particles.f[:] = particles.m[:,None]*acc
+            else:
+                particles.f[active] = particles.m[active,None]*acc[active]
+        return computeForce, {}, None
+    #treepm, mesh of whole cells covering the box
+    M = int(np.ceil(2*L/D))
+    solver = TreePM(Quad(-L,-L,M*D), M, epsilon, theta=sol['theta'],
+                    rs=sol['rs'], rcut=sol['rcut'], kernel=sol['kernel'],
+                    leafSize=sol['leafSize'], groupSize=sol['groupSize'],
+                    expansionOrder=sol['expansionOrder'],
+                    rebuildInterval=sol['rebuildInterval'], pool=pool)
+    def computeForce(particles, active=None):
+        #the mesh is solved for everyone whichever bodies are active
+        acc = solver.accel(particles.r, particles.m)
+        if active is None:
+            particles.f[:] = particles.m[:,None]*acc
+        else:
+            particles.f[active] = particles.m[active,None]*acc[active]
+    def potential(particles):
+        #unsplit potential from the short range tree
+        return treeEnergy(solver.tree, particles.m, sol['theta'], epsilon, sol['groupSize'])
+    return computeForce, {'tree': solver.tree}, potential
+
+#function: time stepper and objects whose state is checkpointed
+def makeIntegrator(config):
+    itg = config['integrator']
+    if itg['name'] == 'block':
+        step = BlockStep(softening(config), eta=itg['eta'], maxLevel=itg['maxLevel'])
+        return step, {'integrator': step}
+    return getIntegrator(itg['name']), {}
+
+#function: run simulation of config, optionally from its checkpoint
+def run(config, resume=False):
+    run_, out, par = config['run'], config['output'], config['parallel']
+    if par['backend']:
+        setBackend(par['backend'])
+    pool, diag = None, None
+    if par['workers'] != 1:
+        #only imported when used, it starts worker processes
+        from Parallel import ParallelForce
+        pool = ParallelForce(par['workers'])
+    try:
+        dt = run_['dt']
+        steps = int(round(run_['T']/dt))
+        base = os.path.join(out['dir'], run_['name'])
+        computeForce, objects, potential = makeForce(config, pool)
+        computeForce = Profiler.timed('force')(computeForce)
+        step, more = makeIntegrator(config)
+        objects.update(more)
+        if resume:
+            #bodies, forces and solver state as checkpointed
+            particles, start, t, states = Checkpoint.load(base+'.npz')
+        if out['diagnostics']:
+            #records of steps past the checkpoint are written again
+            diag = Diagnostics(potential, every=out['diagnostics'],
+                               path=base+'.diag.jsonl', append=resume,
+                               lastStep=start if resume else None)
+            objects['diagnostics'] = diag
+        if resume:
+            for name, obj in objects.items():
+                if name in states:
+                    obj.restore(states[name])
+            snaps = SnapshotWriter(base+'.nbs', every=out['every'],
+                                   append=True, lastStep=start)
+        else:
+            if run_['seed'] is not None:
+                np.random.seed(run_['seed'])
+            particles = makeParticles(config)
+            computeForce(particles)
+            start = 0
+            snaps = SnapshotWriter(base+'.nbs', every=out['every'], meta=config)
+            snaps.write(particles, 0, 0.0)
+            if diag:
+                diag(particles, 0, 0.0)
+        profile = None
+        if out['profile']:
+            Profiler.enable()
+            if resume:
+                #records of steps past the checkpoint are written again
+                profile = Profiler.openRecords(base+'.profile.jsonl', start)[0]
+            else:
+                profile = open(base+'.profile.jsonl', 'w')
+        with snaps:
+            for i in range(start, steps):
+                with Profiler.phase('step'):
+                    step(particles, dt, computeForce)
+                meta = None
+                if profile:
+                    #output of a step is timed in the record of the next
+                    meta = {'profile': Profiler.record()}
+                    profile.write(json.dumps(dict(step=i+1, **meta['profile']))+"\n")
+                    profile.flush()
+                snaps.write(particles, i+1, (i+1)*dt, meta)
+                if diag:
+                    diag(particles, i+1, (i+1)*dt)
+                if out['checkpointEvery'] and (i+1) % out['checkpointEvery'] == 0:
+                    Checkpoint.save(base+'.npz', particles, i+1, (i+1)*dt,
+                                    **{name: obj.state() for name, obj in objects.items()})
+                if out['log'] and (i+1) % out['log'] == 0:
+                    print("step "+str(i+1)+"/"+str(steps)+" t="+str((i+1)*dt))
+                    sys.stdout.flush()
+    finally:
+        if pool:
+            pool.close()
+        if diag:
+            diag.close()
+        if out['profile']:
+            Profiler.disable()
+            if profile:
+                profile.close()
+    return particles
+
+#function: main
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='nbody', description="N-body simulation runner")
+    commands = parser.add_subparsers(dest='command', required=True)
+    p = commands.add_parser('run', help="run simulation from config file")
+    p.add_argument('config', help="TOML or JSON config file")
+    p.add_argument('--resume', action='store_true',
+                   help="continue from the run's last checkpoint")
+    p.add_argument('--set', '-s', action='append', default=[], metavar='SECTION.KEY=VALUE',
+                   help="override config value, may be repeated")
+    p = commands.add_parser('movie', help="render snapshot file to movie")
+    p.add_argument('snapshots', help="snapshot file written by run")
+    p.add_argument('out', help="movie file, such as run.mp4 or run.gif")
+    p.add_argument('--interval', type=int, default=100, help="milliseconds per frame")
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(loadConfig(args.config, args.set), resume=args.resume)
+    else:
+        with SnapshotReader(args.snapshots) as snaps:
+            L = snaps.meta['initial']['L']
+        movie(args.snapshots, args.out, L, interval=args.interval)
+
+if __name__ == '__main__':
+    main()